@@ -0,0 +1,188 @@
+import copy
+import hashlib
+import json
+import os
+import time
+import matplotlib.pyplot as plt
+from app.encoder import MODEL_NAME
+from app.embedding_store import resolve_dtype
+from app.profiling import trace, span
+from app.session_store import SESSION_DIR, load_table, save_table, table_columns, table_path
+from app.semantic_dedup import SEMANTIC_THRESHOLD
+
+STATE_PATH = os.path.join(SESSION_DIR, "batch_state.json")
+EMBEDDING_PATH = "data/initial_embeddings.npy"
+STAGES = ["load", "embed", "dedup", "cluster", "eda"]
+
+DEFAULTS = {
+    "input": {"path": None, "encoding": "utf-8", "delimiter": ",", "header": True, "column_names": None},
+    "rename": {},
+    "text_col": None,
+    "metadata": [],
+    "cast": {},
+    "embed": {"backend": None, "store": None, "use_cache": True},
+    "dedup": {"enabled": True, "stopwords": "default", "semantic": False, "threshold": SEMANTIC_THRESHOLD,
+              "incremental": False, "metadata_cols": []},
+    "cluster": {"enabled": True, "k": None, "save_wordclouds": True, "label_with_llm": False},
+    "eda": {"enabled": True, "metadata": None},
+    "force": [],
+}
+
+# Files each stage must have left behind for a matching fingerprint to count as up to date
+OUTPUTS = {
+    "load": [table_path("start")],
+    "embed": [EMBEDDING_PATH, table_path("metadata")],
+    "dedup": ["results/dedup/dup_groups.csv"],
+    "cluster": [table_path("clustered")],
+    "eda": ["results/eda"],
+}
+
+
+def load_config(path):
+    with open(path) as f:
+        user = json.load(f)
+    config = copy.deepcopy(DEFAULTS)
+    for key, value in user.items():
+        if isinstance(config.get(key), dict) and isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+
+    if not config["input"]["path"] or not config["text_col"]:
+        raise ValueError("Batch config needs input.path and text_col.")
+    unknown = set(config["force"]) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages in force: {sorted(unknown)}")
+    return config
+
+
+def fingerprint(*parts):
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime]
+
+
+def stage_fingerprints(config):
+    """Each stage hashes its own parameters together with the fingerprint of the stage it reads from,
+    so a change anywhere invalidates exactly the stages downstream of it."""
+    fps = {}
+    fps["load"] = fingerprint("load", file_signature(config["input"]["path"]), config["input"], config["rename"],
+                              config["text_col"], config["metadata"], config["cast"])
+    # use_cache only changes how vectors are obtained, not what they are
+    fps["embed"] = fingerprint("embed", fps["load"], MODEL_NAME, config["embed"]["backend"],
+                               resolve_dtype(config["embed"]["store"]))
+    fps["dedup"] = fingerprint("dedup", fps["embed"], config["dedup"])
+    fps["cluster"] = fingerprint("cluster", fps["embed"], config["cluster"])
+    fps["eda"] = fingerprint("eda", fps["embed"], config["eda"], config["metadata"])
+    return fps
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def run_load(config):
+    from app.ingest import csv_options, ingest_csv
+
+    source = config["input"]
+    options = csv_options(source["encoding"], source["delimiter"], 0 if source["header"] else None,
+                          source["column_names"])
+    df = ingest_csv(source["path"], config["text_col"], config["metadata"], config["cast"], config["rename"], **options)
+    save_table(df, "start")
+    print(f"[+] Loaded {len(df)} rows from {source['path']}")
+
+
+def run_embed(config):
+    from app.embedding import generate_embeddings
+
+    generate_embeddings(load_table("start"), config["text_col"], use_cache=config["embed"]["use_cache"])
+
+
+def run_dedup(config):
+    from app.dedup import trex_dedup
+    from app.embedding import EMBED_STATS_COLUMNS
+
+    params = config["dedup"]
+    stopwords = params["stopwords"]
+    columns = [c for c in table_columns("metadata") if c not in EMBED_STATS_COLUMNS]
+    trex_dedup(load_table("metadata", columns=columns), config["text_col"],
+               stopword_flag=bool(stopwords), stopwords=None if stopwords == "default" else stopwords,
+               semantic=params["semantic"], semantic_threshold=params["threshold"],
+               incremental=params["incremental"], interactive=False, metadata_cols=params["metadata_cols"])
+
+
+def run_cluster(config):
+    from app.clustering import run_clustering_pipeline
+
+    params = config["cluster"]
+    run_clustering_pipeline(EMBEDDING_PATH, "metadata", text_col=config["text_col"], interactive=False,
+                            k=params["k"], save_wordclouds=params["save_wordclouds"],
+                            label_with_llm=params["label_with_llm"])
+
+
+def run_eda(config):
+    from app.embedding import STATS_COLUMNS
+    from app.pipeline import metadata_viz
+
+    columns = config["eda"]["metadata"] or config["metadata"]
+    df = load_table("metadata", columns=["row_id", config["text_col"]] + columns + STATS_COLUMNS)
+    metadata_viz(df, config["text_col"], columns, interactive=False)
+
+
+RUNNERS = {"load": run_load, "embed": run_embed, "dedup": run_dedup, "cluster": run_cluster, "eda": run_eda}
+
+
+def run_batch(config_path, force=()):
+    """Run the pipeline headlessly from a JSON config, skipping stages whose inputs and parameters are unchanged."""
+    config = load_config(config_path)
+    if config["embed"]["backend"]:
+        os.environ["TREX_EMBED_BACKEND"] = config["embed"]["backend"]
+    if config["embed"]["store"]:
+        os.environ["TREX_EMBED_STORE"] = config["embed"]["store"]
+    # Plots are written to results/ instead of opening windows
+    plt.switch_backend("Agg")
+
+    force = set(config["force"]) | set(force)
+    fps = stage_fingerprints(config)
+    state = load_state()
+    start = time.time()
+
+    with trace("batch"):
+        run_stages(config, fps, state, force)
+
+    print(f"[✓] Batch run complete in {time.time() - start:.2f} seconds")
+    return state
+
+
+def run_stages(config, fps, state, force):
+    for stage in STAGES:
+        if stage in ("dedup", "cluster", "eda") and not config[stage]["enabled"]:
+            print(f"[=] {stage}: disabled in config")
+            continue
+        outputs_exist = all(os.path.exists(p) for p in OUTPUTS[stage])
+        if stage not in force and state.get(stage) == fps[stage] and outputs_exist:
+            print(f"[=] {stage}: up to date, skipping")
+            continue
+
+        print(f"[*] {stage}: running")
+        stage_start = time.time()
+        with span(stage):
+            RUNNERS[stage](config)
+        state[stage] = fps[stage]
+        save_state(state)
+        print(f"[+] {stage}: done in {time.time() - stage_start:.2f} seconds")
@@ -0,0 +1,143 @@
+from statistics import NormalDist
+import numpy as np
+from app.profiling import span
+
+MAX_MEMORY_MB = 256
+EXACT_MAX_ROWS = 50_000
+SAMPLE_SIZE = 10_000
+
+
+def block_rows(n_cols, max_memory_mb):
+    # One float32 distance block (b x n_cols) plus its temporaries must fit the budget
+    return max(1, int(max_memory_mb * 1024 * 1024 / (4 * 3 * max(n_cols, 1))))
+
+
+def silhouette_values(X, labels, rows=None, max_memory_mb=MAX_MEMORY_MB):
+    """Exact silhouette of the given rows (all by default) against every point, in memory-bounded blocks.
+
+    X may be a memory-mapped array. Distances are Euclidean, matching sklearn's default;
+    members of singleton clusters score 0.
+    """
+    labels = np.asarray(labels)
+    clusters, codes = np.unique(labels, return_inverse=True)
+    k = len(clusters)
+    sizes = np.bincount(codes, minlength=k)
+    rows = np.arange(len(X)) if rows is None else np.asarray(rows)
+    if k < 2:
+        raise ValueError("Silhouette needs at least 2 clusters")
+
+    n = len(X)
+    # Square row x column distance blocks keep memory flat for any n
+    step = max(1, int(np.sqrt(block_rows(1, max_memory_mb))))
+    sq_norms = np.concatenate([np.einsum('ij,ij->i', b, b) for b in
+                               (np.asarray(X[j:j + step], dtype=np.float32) for j in range(0, n, step))])
+    values = np.empty(len(rows), dtype=np.float64)
+
+    for i in range(0, len(rows), step):
+        block = rows[i:i + step]
+        a = np.asarray(X[block], dtype=np.float32)
+        sums = np.zeros((len(block), k), dtype=np.float64)
+        # Per-cluster distance sums accumulate column block by column block
+        for j in range(0, n, step):
+            b = np.asarray(X[j:j + step], dtype=np.float32)
+            d = sq_norms[block][:, None] + sq_norms[j:j + step][None, :] - 2 * (a @ b.T)
+            np.sqrt(np.maximum(d, 0, out=d), out=d)
+            onehot = np.zeros((len(b), k), dtype=np.float32)
+            onehot[np.arange(len(b)), codes[j:j + step]] = 1
+            sums += d @ onehot
+
+        own = codes[block]
+        own_size = sizes[own]
+        intra = sums[np.arange(len(block)), own] / np.maximum(own_size - 1, 1)
+        means = sums / sizes
+        means[np.arange(len(block)), own] = np.inf
+        inter = means.min(axis=1)
+        s = (inter - intra) / np.maximum(np.maximum(intra, inter), np.finfo(np.float64).tiny)
+        values[i:i + len(block)] = np.where(own_size > 1, s, 0.0)
+    return values
+
+
+def blocked_silhouette(X, labels, max_memory_mb=MAX_MEMORY_MB):
+    """Exact mean silhouette in O(n^2) time but bounded memory."""
+    return float(silhouette_values(X, labels, max_memory_mb=max_memory_mb).mean())
+
+
+def sampled_silhouette(X, labels, sample_size=SAMPLE_SIZE, confidence=0.95, seed=42, max_memory_mb=MAX_MEMORY_MB):
+    """Mean silhouette estimated from a random sample of rows, each scored exactly against all points.
+
+    Returns (estimate, ci_low, ci_high) using a normal-approximation confidence interval.
+    """
+    n = len(X)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+    values = silhouette_values(X, labels, rows=rows, max_memory_mb=max_memory_mb)
+    mean = float(values.mean())
+    if len(rows) == n or len(values) < 2:
+        return mean, mean, mean
+    # Finite population correction: the interval closes as the sample approaches n
+    se = values.std(ddof=1) / np.sqrt(len(values)) * np.sqrt((n - len(values)) / (n - 1))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return mean, mean - z * se, mean + z * se
+
+
+def centroid_stats(X, labels, max_memory_mb=MAX_MEMORY_MB):
+    """Cluster centroids, sizes, and per-row distance to own centroid, in two blocked passes."""
+    labels = np.asarray(labels)
+    clusters, codes = np.unique(labels, return_inverse=True)
+    k, dim = len(clusters), X.shape[1]
+    step = block_rows(dim, max_memory_mb)
+
+    sums = np.zeros((k, dim), dtype=np.float64)
+    for i in range(0, len(X), step):
+        np.add.at(sums, codes[i:i + step], np.asarray(X[i:i + step], dtype=np.float64))
+    sizes = np.bincount(codes, minlength=k)
+    centroids = sums / sizes[:, None]
+
+    dist = np.empty(len(X), dtype=np.float64)
+    for i in range(0, len(X), step):
+        block = np.asarray(X[i:i + step], dtype=np.float64)
+        dist[i:i + len(block)] = np.linalg.norm(block - centroids[codes[i:i + step]], axis=1)
+    return centroids, sizes, codes, dist
+
+
+def davies_bouldin(centroids, sizes, codes, dist):
+    """Davies-Bouldin index (lower is better) from centroid_stats output; O(n + k^2)."""
+    scatter = np.bincount(codes, weights=dist, minlength=len(sizes)) / sizes
+    sep = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=2)
+    np.fill_diagonal(sep, np.inf)
+    ratio = (scatter[:, None] + scatter[None, :]) / np.where(sep == 0, np.inf, sep)
+    return float(ratio.max(axis=1).mean())
+
+
+def calinski_harabasz(centroids, sizes, codes, dist):
+    """Calinski-Harabasz index (higher is better) from centroid_stats output; O(n + k)."""
+    n, k = int(sizes.sum()), len(sizes)
+    overall = (centroids * sizes[:, None]).sum(axis=0) / n
+    between = float((sizes * ((centroids - overall) ** 2).sum(axis=1)).sum())
+    within = float((dist ** 2).sum())
+    if within == 0:
+        return 1.0
+    return between * (n - k) / (within * (k - 1))
+
+
+def cluster_quality(X, labels, exact_max_rows=EXACT_MAX_ROWS, sample_size=SAMPLE_SIZE, max_memory_mb=MAX_MEMORY_MB):
+    """Silhouette (exact up to exact_max_rows, sampled with a 95% CI above), Davies-Bouldin and Calinski-Harabasz."""
+    with span("silhouette", rows=len(X)) as s:
+        if len(X) <= exact_max_rows:
+            sil = blocked_silhouette(X, labels, max_memory_mb)
+            low = high = sil
+            method = 'exact'
+        else:
+            sil, low, high = sampled_silhouette(X, labels, sample_size, max_memory_mb=max_memory_mb)
+            method = 'sampled'
+        s["method"] = method
+    with span("davies_bouldin_calinski_harabasz", rows=len(X)):
+        stats = centroid_stats(X, labels, max_memory_mb)
+    return {
+        'silhouette': sil,
+        'silhouette_ci_low': low,
+        'silhouette_ci_high': high,
+        'silhouette_method': method,
+        'davies_bouldin': davies_bouldin(*stats),
+        'calinski_harabasz': calinski_harabasz(*stats),
+    }
@@ -1,139 +1,171 @@
 import os
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.cluster import MiniBatchKMeans
-from sklearn.metrics import silhouette_score
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 from wordcloud import WordCloud
-import httpx
 import json
 import re
-import time
-from dotenv import load_dotenv
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-STOPWORDS = set(stopwords.words("english"))
-
-def run_elbow_plot(embeddings):
-    inertias = []
-    for k in range(2, 21):
-        kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=256)
-        kmeans.fit(embeddings)
-        inertias.append(kmeans.inertia_)
-
-    plt.figure(figsize=(8, 5))
-    plt.plot(range(2, 21), inertias, marker='o')
-    plt.title("Elbow Plot for KMeans Clustering")
-    plt.xlabel("Number of Clusters")
-    plt.ylabel("Inertia")
-    plt.tight_layout()
-    plt.show()
-
-def get_keywords(texts, topn=10):
-    words = " ".join(texts)
-    tokens = [w.lower() for w in word_tokenize(words) if w.isalpha() and w.lower() not in STOPWORDS]
-    freq = pd.Series(tokens).value_counts()
-    return freq.head(topn).index.tolist()
+from app.token_cache import get_token_cache
+from app.k_selection import k_sweep, recommend_k
+from app.cluster_metrics import cluster_quality
+from app.keywords import cluster_keywords
+from app.llm_client import chat_many_sync
+from app.llm_cache import print_stats
+from app.session_store import load_table, save_table
+from app.interaction import show, confirm
+from app.profiling import span
+from app.embedding_store import open_store
+
+KMEANS_FIT_ROWS = 200_000
+PREDICT_BLOCK_ROWS = 65_536
+
+def run_elbow_plot(embeddings, interactive=True):
+    """Sweep k on a subsample in parallel, plot inertia and silhouette, and return the recommended k."""
+    with span("k_sweep", rows=len(embeddings)):
+        results = k_sweep(embeddings)
+    best_k = recommend_k(results)
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.plot(results['k'], results['inertia'], marker='o')
+    ax.axvline(best_k, color='gray', linestyle='--', label=f"Recommended k = {best_k}")
+    ax.set_title("Elbow Plot for KMeans Clustering")
+    ax.set_xlabel("Number of Clusters")
+    ax.set_ylabel("Inertia")
+    ax2 = ax.twinx()
+    ax2.plot(results['k'], results['silhouette'], marker='x', color='tab:orange', alpha=0.6)
+    ax2.set_ylabel("Silhouette (sampled)")
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    if interactive:
+        plt.show()
+    else:
+        fig.savefig("results/clustering/elbow_plot.png")
+        plt.close(fig)
 
-def label_clusters_with_llm(cluster_keywords, temperature=0.3, max_tokens=40):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    print(results.round(4).to_string(index=False))
+    print(f"[+] Recommended number of clusters: {best_k}")
+    return best_k
 
-    labels = []
-    for i, kw in enumerate(cluster_keywords):
+def parse_label(content):
+    try:
+        return json.loads(content.strip())["label"]
+    except Exception:
+        match = re.search(r'"label"\s*:\s*"(.+?)"', content)
+        return match.group(1) if match else None
+
+def label_clusters_with_llm(cluster_keywords, temperature=0.3, max_tokens=40):
+    requests = []
+    for kw in cluster_keywords:
         prompt = (
             f"I will give you a list of keywords from a text cluster with stopwords already removed. Start your response with a short label (1–4 words) followed by ---"
             f"in JSON format like {{\"label\": \"Cluster Name\"}}.\n\nKeywords:\n{', '.join(kw)}"
         )
-        payload = {
-            "model": "llama3-70b-8192",
+        requests.append({
             "messages": [
                 {"role": "system", "content": "You generate short cluster labels from keywords."},
                 {"role": "user", "content": prompt}
             ],
             "temperature": temperature,
             "max_tokens": max_tokens,
-            "stop": '---'
-        }
-
-        for attempt in range(3):
-            try:
-                res = httpx.post(url, headers=headers, json=payload, timeout=10)
-                if res.status_code == 200:
-                    content = res.json()['choices'][0]['message']['content']
-                    try:
-                        label = json.loads(content.strip())["label"]
-                        labels.append(label)
-                        break
-                    except:
-                        match = re.search(r'"label"\s*:\s*"(.+?)"', content)
-                        if match:
-                            labels.append(match.group(1))
-                            break
-                time.sleep(1)
-            except Exception as e:
-                print(f"[!] Retry {attempt+1} failed:", e)
-                time.sleep(1)
+            "stop": '---',
+            # Replies without a parseable label are re-requested and kept out of the reply cache
+            "validate": lambda reply: parse_label(reply) is not None,
+        })
+
+    # All clusters are labelled concurrently over one pooled connection
+    labels = []
+    for i, reply in enumerate(chat_many_sync(requests)):
+        if isinstance(reply, Exception):
+            print(f"[!] Labelling cluster {i} failed:", reply)
+            label = None
         else:
-            labels.append("Sorry! Failed to generate label")
+            label = parse_label(reply)
+        labels.append(label or "Sorry! Failed to generate label")
+    print_stats()
 
     return labels
 
-def run_clustering_pipeline(embedding_path="data/initial_embeddings.npy", metadata_path="data/embedding_metadata.csv"):
+def fit_clusters(X, k, fit_rows=KMEANS_FIT_ROWS, seed=42):
+    """MiniBatchKMeans on at most fit_rows rows, then labels for every row block by block,
+    so the (memory-mapped) matrix never has to be held in RAM as float32."""
+    if len(X) <= fit_rows:
+        fit = X[:]
+    else:
+        rng = np.random.default_rng(seed)
+        fit = X[np.sort(rng.choice(len(X), size=fit_rows, replace=False))]
+    model = MiniBatchKMeans(n_clusters=k, batch_size=256, random_state=seed).fit(fit)
+    del fit
+    return np.concatenate([model.predict(X[s:s + PREDICT_BLOCK_ROWS]) for s in range(0, len(X), PREDICT_BLOCK_ROWS)])
+
+def run_clustering_pipeline(embedding_path="data/initial_embeddings.npy", metadata_table="metadata", text_col="text",
+                            interactive=True, k=None, save_wordclouds=True, label_with_llm=False):
+    """Cluster the session's embeddings. With interactive=False nothing is prompted: k defaults to the
+    recommended value, and save_wordclouds / label_with_llm decide the optional steps."""
     os.makedirs("results/clustering", exist_ok=True)
 
     # Load embeddings + metadata
-    X = np.load(embedding_path)
-    df = pd.read_csv(metadata_path)
-    print(f"[+] Loaded {len(X)} embeddings.")
+    X = open_store(embedding_path)
+    df = load_table(metadata_table)
+    print(f"[+] Loaded {len(X)} embeddings ({X.dtype}, {X.nbytes / 2**20:.1f} MB).")
 
     # Elbow plot
-    run_elbow_plot(X)
-    try:
-        k = int(input("Enter the number of clusters: "))
-    except:
-        print("Invalid input. Exiting.")
-        return
+    best_k = run_elbow_plot(X, interactive)
+    if not interactive:
+        k = k or best_k
+    else:
+        try:
+            k = int(input(f"Enter the number of clusters (blank for {best_k}): ").strip() or best_k)
+        except:
+            print("Invalid input. Exiting.")
+            return
 
     # Cluster and assign labels
-    model = MiniBatchKMeans(n_clusters=k, batch_size=256, random_state=42)
-    df["cluster"] = model.fit_predict(X)
-
-    score = silhouette_score(X, df["cluster"])
-    print(f"[+] Clustering complete. Silhouette Score: {score:.4f}")
+    with span("kmeans_fit", rows=len(X), k=k):
+        df["cluster"] = fit_clusters(X, k)
+
+    quality = cluster_quality(X, df["cluster"].to_numpy())
+    if quality['silhouette_method'] == 'exact':
+        print(f"[+] Clustering complete. Silhouette Score: {quality['silhouette']:.4f}")
+    else:
+        print(f"[+] Clustering complete. Silhouette Score: {quality['silhouette']:.4f} "
+              f"(sampled, 95% CI {quality['silhouette_ci_low']:.4f}-{quality['silhouette_ci_high']:.4f})")
+    print(f"[+] Davies-Bouldin: {quality['davies_bouldin']:.4f} | Calinski-Harabasz: {quality['calinski_harabasz']:.1f}")
+
+    # c-TF-IDF keywords per cluster, computed once for the wordclouds and the LLM labels
+    tokens = get_token_cache(df[text_col])
+    with span("keywords", rows=len(df)):
+        keyword_scores = cluster_keywords(tokens, df["cluster"].to_numpy(), k)
+    cluster_kw = [[word for word, _ in scores] for scores in keyword_scores]
 
     # Show wordclouds
     for i in range(k):
-        texts = df[df["cluster"] == i]["text"].astype(str)
-        keywords = get_keywords(texts)
-        wc = WordCloud(width=800, height=400, background_color="white").generate(" ".join(keywords))
+        if not keyword_scores[i]:
+            print(f"[!] Cluster {i} has no keywords, skipping wordcloud.")
+            continue
+        wc = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(dict(keyword_scores[i]))
         plt.figure(figsize=(10, 5))
         plt.imshow(wc, interpolation="bilinear")
         plt.axis("off")
         plt.title(f"WordCloud - Cluster {i}")
         plt.tight_layout()
-        plt.show()
+        show(interactive)
 
-        if input(f"Save wordcloud for cluster {i}? (y/n): ").strip().lower() == "y":
+        if confirm(f"Save wordcloud for cluster {i}? (y/n): ", interactive, default=save_wordclouds):
             wc.to_file(f"results/clustering/wordcloud_cluster_{i}.png")
             print(f"[+] Saved: wordcloud_cluster_{i}.png")
+        if not interactive:
+            plt.close()
 
     # Ask to label using LLM
-    if input("Do you want to auto-label using LLM? (y/n): ").strip().lower() == "y":
+    if confirm("Do you want to auto-label using LLM? (y/n): ", interactive, default=label_with_llm):
         print("[*] Sending cluster keywords to Groq API...")
-        cluster_kw = [get_keywords(df[df["cluster"] == i]["text"].astype(str)) for i in range(k)]
         cluster_labels = label_clusters_with_llm(cluster_kw)
+        df["cluster_label"] = np.array(cluster_labels, dtype=object)[df["cluster"].to_numpy()]
 
         print("\n=== Cluster Labels ===")
         for i, label in enumerate(cluster_labels):
             print(f"Cluster {i}: {label}")
 
     # Save results
-    df.to_csv("data/clustered.csv", index=False)
-    print("[+] Saved clustered dataset to data/clustered.csv")
+    path = save_table(df, "clustered")
+    print(f"[+] Saved clustered dataset to {path}")
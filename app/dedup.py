@@ -4,66 +4,59 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
-from datasketch import MinHash, MinHashLSH
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from collections import Counter
-import math
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import CountVectorizer
-
-
-def trex_dedup(df, text_col, stopword_flag=True):
+from app.registry import get_stopwords
+from app.features import ensure_text_features
+from app.token_cache import get_token_cache
+from app.dedup_groups import group_duplicates, save_groups, GROUPS_PATH
+from app.lsh_store import dedup_against_index, INDEX_DIR
+from app.semantic_dedup import semantic_dedup, SEMANTIC_THRESHOLD, PAIRS_PATH
+
+
+def trex_dedup(df, text_col, stopword_flag=True, semantic=False, semantic_threshold=SEMANTIC_THRESHOLD,
+               incremental=False, interactive=True, stopwords=None, metadata_cols=None):
+    """Duplicate analysis of df. With interactive=False nothing is prompted: stopwords (a list, or None
+    for the default set) and metadata_cols (columns for the metadata-aware plots) are used instead."""
     os.makedirs("results/dedup", exist_ok=True)
 
     print("[+] Starting deduplication pipeline...")
 
     # Step 1: Text Cleaning
-    print("[?] Remove stopwords? (y/n): ", end="")
-    if stopword_flag:
+    if not stopword_flag:
+        stopword_set = set()
+    elif not interactive:
+        stopword_set = get_stopwords() if stopwords is None else set(w.strip().lower() for w in stopwords)
+    else:
+        print("[?] Remove stopwords? (y/n): ", end="")
         use_default = input("Use default stopwords? (y/n): ").strip().lower() == 'y'
         if use_default:
-            stopword_set = set(stopwords.words('english'))
+            stopword_set = get_stopwords()
         else:
             custom_sw = input("Enter custom stopwords (comma-separated): ").split(',')
             stopword_set = set(word.strip().lower() for word in custom_sw)
-    else:
-        stopword_set = set()
-
-    def clean_text(text):
-        tokens = word_tokenize(text)
-        return " ".join([t for t in tokens if t.lower() not in stopword_set])
 
-    df['clean_text'] = df[text_col].astype(str).apply(clean_text)
+    df['clean_text'] = get_token_cache(df[text_col]).filtered_texts(stopword_set)
 
     # Step 2: MinHash LSH Deduplication
     print("[+] Running MinHash LSH...")
-    lsh = MinHashLSH(threshold=0.8, num_perm=128)
-    minhashes = {}
-
-    for i, row in df.iterrows():
-        tokens = set(row['clean_text'].split())
-        m = MinHash(num_perm=128)
-        for t in tokens:
-            m.update(t.encode('utf8'))
-        lsh.insert(str(row['row_id']), m)
-        minhashes[row['row_id']] = m
-
-    duplicate_types = []
-    for i, row in df.iterrows():
-        row_id = str(row['row_id'])
-        result = lsh.query(minhashes[row['row_id']])
-        result = set(result) - {row_id}
-        if not result:
-            duplicate_types.append('unique')
-        else:
-            max_sim = max(minhashes[row['row_id']].jaccard(minhashes[int(r)]) for r in result)
-            if max_sim == 1.0:
-                duplicate_types.append('exact_duplicate')
-            else:
-                duplicate_types.append('near_duplicate')
-
-    df['dup_type'] = duplicate_types
+    signatures, codes = group_duplicates(df, 'clean_text')
+    print(f"[+] MinHashed {len(signatures)} distinct texts out of {len(df)} rows")
+    groups = save_groups(df)
+    print(f"[+] Saved {groups['dup_group_id'].nunique()} duplicate groups to {GROUPS_PATH}")
+
+    if incremental:
+        print(f"[+] Checking batch against the persistent LSH index at {INDEX_DIR}...")
+        added = dedup_against_index(df, signatures, codes)
+        seen = df['seen_status'].value_counts()
+        print(f"[+] Previously seen: {seen.get('seen_exact', 0)} exact, {seen.get('seen_near', 0)} near; "
+              f"added {added} new documents to the index")
+        df[['row_id', 'seen_status', 'seen_match_key']].to_csv("results/dedup/seen_before.csv", index=False)
+
+    if semantic:
+        print(f"[+] Searching for semantic near-duplicates (cosine >= {semantic_threshold})...")
+        pairs = semantic_dedup(df, threshold=semantic_threshold)
+        print(f"[+] Found {len(pairs)} semantic pairs across {df['semantic_duplicate'].sum()} rows, saved to {PAIRS_PATH}")
 
     plt.figure(figsize=(8, 6))
     sns.countplot(data=df, x='dup_type')
@@ -74,12 +67,7 @@ def trex_dedup(df, text_col, stopword_flag=True):
 
     # Step 3: 3-Gram + Entropy
     print("[+] Computing Shannon Entropy and 3-gram overlap...")
-    def shannon_entropy(text):
-        prob = [c / len(text) for c in Counter(text).values()]
-        return -sum(p * math.log2(p) for p in prob if p > 0)
-
-    df['entropy'] = df['clean_text'].apply(shannon_entropy)
-    df['word_count'] = df['clean_text'].apply(lambda x: len(x.split()))
+    ensure_text_features(df, text_col, get_stopwords())
 
     plt.figure(figsize=(8, 6))
     sns.histplot(df['entropy'], bins=30)
@@ -96,19 +84,22 @@ def trex_dedup(df, text_col, stopword_flag=True):
     print("[+] Saved entropy_vs_wordcount.png")
 
     # Step 3: Metadata-Aware (optional)
-    print("[?] Run metadata-aware duplication analysis? (y/n): ", end="")
-    if input().strip().lower() == 'y':
-        cols = input("Enter metadata columns (comma separated): ").split(',')
-        cols = [c.strip() for c in cols if c.strip() in df.columns and df[c].dtype == 'object']
-
-        for col in cols:
-            for val, group in df.groupby(col):
-                plt.figure(figsize=(8, 6))
-                sns.countplot(data=group, x='dup_type')
-                plt.title(f"Duplication Types for {col} = {val}")
-                plt.tight_layout()
-                fname = f"results/dedup/dup_type_{col}_{str(val).replace(' ', '_')}.png"
-                plt.savefig(fname)
-                print(f"[+] Saved {fname}")
+    if not interactive:
+        cols = metadata_cols or []
+    else:
+        print("[?] Run metadata-aware duplication analysis? (y/n): ", end="")
+        cols = input("Enter metadata columns (comma separated): ").split(',') if input().strip().lower() == 'y' else []
+    cols = [c.strip() for c in cols]
+    cols = [c for c in cols if c in df.columns and df[c].dtype.name in ('object', 'category', 'str', 'string')]
+
+    for col in cols:
+        for val, group in df.groupby(col):
+            plt.figure(figsize=(8, 6))
+            sns.countplot(data=group, x='dup_type')
+            plt.title(f"Duplication Types for {col} = {val}")
+            plt.tight_layout()
+            fname = f"results/dedup/dup_type_{col}_{str(val).replace(' ', '_')}.png"
+            plt.savefig(fname)
+            print(f"[+] Saved {fname}")
 
     print("[✓] Deduplication pipeline complete. Ready for next command.")
@@ -0,0 +1,106 @@
+import os
+import numpy as np
+import pandas as pd
+from app.minhash import minhash_signatures, lsh_neighbours, jaccard_many, NUM_PERM, THRESHOLD
+from app.profiling import span
+
+GROUPS_PATH = "results/dedup/dup_groups.csv"
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Lower index wins so the root is always the earliest member
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+    def roots(self):
+        return np.array([self.find(i) for i in range(len(self.parent))])
+
+
+def content_hashes(texts):
+    return pd.util.hash_pandas_object(pd.Series(texts, dtype=object), index=False).values
+
+
+def group_duplicates(df, text_col='clean_text', threshold=THRESHOLD, num_perm=NUM_PERM):
+    """Assign duplicate groups: exact copies collapse by content hash, near copies merge via LSH and union-find.
+
+    Adds dup_type, dup_group_id, dup_canonical_id (row_id of the group's first row) and
+    is_canonical to df. Returns the signatures of the distinct texts and, per row, the
+    index of its distinct text.
+    """
+    texts = df[text_col].astype(str)
+    # Byte-identical texts share one content-hash code and are MinHashed only once
+    codes, _ = pd.factorize(content_hashes(texts))
+    first_rows = np.unique(codes, return_index=True)[1]
+    multiplicity = np.bincount(codes)
+    distinct_texts = texts.iloc[first_rows].tolist()
+
+    with span("minhash_build", rows=len(distinct_texts)):
+        signatures = minhash_signatures([set(t.split()) for t in distinct_texts], num_perm=num_perm)
+    with span("lsh_query", rows=len(signatures)):
+        first, inverse, counts, neighbours = lsh_neighbours(signatures, threshold)
+
+    with span("union_find", rows=len(first)):
+        uf = UnionFind(len(first))
+        for u, near in enumerate(neighbours):
+            if not near:
+                continue
+            # LSH buckets admit false positives, which union-find would chain into unrelated groups
+            near = np.asarray(near)
+            near = near[jaccard_many(signatures, first[u], first[near]) >= threshold]
+            neighbours[u] = near
+            for v in near:
+                uf.union(u, v)
+        sig_roots = uf.roots()
+
+    # Rows -> distinct text -> distinct signature -> connected component
+    row_sig = inverse[codes]
+    row_root = sig_roots[row_sig]
+    group_ids, canonical_pos = np.unique(row_root, return_index=True)
+    order = np.argsort(canonical_pos)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    group_index = np.searchsorted(group_ids, row_root)
+
+    sig_rows = np.bincount(inverse, weights=multiplicity).astype(np.int64)
+    dup_type = np.where(
+        sig_rows[row_sig] > 1, 'exact_duplicate',
+        np.where(np.array([len(n) > 0 for n in neighbours])[row_sig], 'near_duplicate', 'unique')
+    )
+
+    row_ids = df['row_id'].to_numpy()
+    df['dup_type'] = dup_type
+    df['dup_group_id'] = rank[group_index]
+    df['dup_canonical_id'] = row_ids[canonical_pos[group_index]]
+    df['is_canonical'] = row_ids == df['dup_canonical_id'].to_numpy()
+    return signatures, codes
+
+
+def save_groups(df, path=GROUPS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    groups = df[['row_id', 'dup_group_id', 'dup_canonical_id', 'is_canonical', 'dup_type']].copy()
+    groups['group_size'] = groups.groupby('dup_group_id')['row_id'].transform('size')
+    groups.to_csv(path, index=False)
+    return groups
+
+
+def canonical_row_ids(path=GROUPS_PATH):
+    """Row ids of one representative per duplicate group, for stages that only need distinct content."""
+    groups = pd.read_csv(path, usecols=['row_id', 'is_canonical'])
+    return groups.loc[groups['is_canonical'], 'row_id']
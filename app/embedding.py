@@ -1,49 +1,83 @@
 import pandas as pd
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
 import time
+from app.embedding_cache import EmbeddingCache, cached_encode
+from app.encoder import load_model, check_quantized_accuracy
+from app.registry import get_model, get_stopwords, replace
+from app.features import compute_text_features, FEATURE_COLUMNS
+from app.parallel_embedding import parallel_encode, reuse_pool, default_workers, PARALLEL_MIN_ROWS
+from app.session_store import save_table
+from app.embedding_store import save_store
+from app.profiling import span
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+ACCURACY_SAMPLE_SIZE = 256
+EMBED_STATS_COLUMNS = ['embed_mean', 'embed_std', 'embed_norm']
+STATS_COLUMNS = EMBED_STATS_COLUMNS + FEATURE_COLUMNS
 
-def generate_embeddings(df, text_col):
-    start_time = time.time()
+model_verified = False
 
-    texts = df[text_col].astype(str).tolist()
-    ids = df['row_id'].tolist()
+def ensure_model_accuracy(texts):
+    # Checked once per process on the first batch; falls back to fp32 on CPU if int8 drifts too far
+    global model_verified
+    if model_verified:
+        return
+    if not check_quantized_accuracy(get_model(), texts[:ACCURACY_SAMPLE_SIZE]):
+        replace("model", load_model('cpu'))
+    model_verified = True
 
-    embeddings = model.encode(
+def encode_texts(texts):
+    model = get_model()
+    workers = default_workers()
+    if model.trex_device == 'cpu' and workers > 1 and len(texts) >= PARALLEL_MIN_ROWS:
+        return parallel_encode(texts, backend=model.trex_backend, workers=workers,
+                               tokenizer=model.tokenizer, max_length=model.max_seq_length)
+
+    return model.encode(
         texts,
         batch_size=64,
         show_progress_bar=True,
-        device='cuda',
+        device=model.trex_device,
         num_workers=6,
         convert_to_numpy=True,
         normalize_embeddings=True
     )
 
-    os.makedirs("data", exist_ok=True)
-    np.save("data/initial_embeddings.npy", embeddings)
+def embedding_stats(df, text_col, embeddings, cache_tokens=True):
+    stats_df = df.copy()
+    stats_df['embed_mean'] = embeddings.mean(axis=1)
+    stats_df['embed_std'] = embeddings.std(axis=1)
+    stats_df['embed_norm'] = np.linalg.norm(embeddings, axis=1)
+    features = compute_text_features(df[text_col].astype(str).tolist(), get_stopwords(), cache_tokens=cache_tokens)
+    for col in FEATURE_COLUMNS:
+        stats_df[col] = features[col].to_numpy()
+    return stats_df
 
-    rowid_df = pd.DataFrame({'row_id': ids})
-    rowid_df.to_csv("data/embedding_row_ids.csv", index=False)
+def generate_embeddings(df, text_col, use_cache=True):
+    start_time = time.time()
+
+    texts = df[text_col].astype(str).tolist()
+    ids = df['row_id'].tolist()
+    ensure_model_accuracy(texts)
 
-    # Compute stats
-    embed_mean = embeddings.mean(axis=1)
-    embed_std = embeddings.std(axis=1)
-    embed_norm = np.linalg.norm(embeddings, axis=1)
+    with span("encode", rows=len(texts)), reuse_pool():
+        if use_cache:
+            cache = EmbeddingCache(get_model().trex_cache_name)
+            try:
+                embeddings = cached_encode(texts, encode_texts, cache)
+            finally:
+                cache.close()
+        else:
+            embeddings = encode_texts(texts)
 
-    word_count = df[text_col].astype(str).apply(lambda x: len(x.split()))
-    char_count = df[text_col].astype(str).apply(len)
+    os.makedirs("data", exist_ok=True)
+    save_store(embeddings, "data/initial_embeddings.npy")
 
-    stats_df = df.copy()
-    stats_df['embed_mean'] = embed_mean
-    stats_df['embed_std'] = embed_std
-    stats_df['embed_norm'] = embed_norm
-    stats_df['word_count'] = word_count
-    stats_df['char_count'] = char_count
+    save_table(pd.DataFrame({'row_id': ids}), "row_ids")
 
-    stats_df.to_csv("data/embedding_metadata.csv", index=False)
+    with span("embedding_stats", rows=len(df)):
+        stats_df = embedding_stats(df, text_col, embeddings)
+    save_table(stats_df, "metadata")
 
     elapsed = time.time() - start_time
     print(f"[+] Embeddings generated and cached in {elapsed:.2f} seconds")
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import time
+import numpy as np
+
+CACHE_PATH = "data/embedding_cache.db"
+MAX_ENTRIES = 1_000_000
+SQLITE_MAX_VARS = 900
+
+
+def normalize_text(text):
+    # Whitespace-only differences don't change the tokenized input, so they share a vector
+    return " ".join(str(text).split())
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key BLOB NOT NULL, dim INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), SQLITE_MAX_VARS):
+            chunk = keys[start:start + SQLITE_MAX_VARS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, dim, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                [self.model_name, *chunk]
+            ).fetchall()
+            for key, dim, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+            [(now, self.model_name, k) for k in found]
+        )
+        self.conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys, vectors):
+        now = time.time()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, key, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(self.model_name, k, v.shape[0], v.tobytes(), now) for k, v in zip(keys, vectors)]
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+
+        # Least recently used entries go first, regardless of model
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE (model, key) IN "
+            "(SELECT model, key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self.conn.commit()
+        return excess
+
+    def close(self):
+        self.conn.close()
+
+
+def cached_encode(texts, encode_fn, cache):
+    """Encode texts, running encode_fn only on texts whose vector is not in the cache."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    keys = [text_key(t) for t in texts]
+
+    unique_index = {}
+    inverse = np.empty(len(keys), dtype=np.int64)
+    first_text = []
+    for i, key in enumerate(keys):
+        idx = unique_index.get(key)
+        if idx is None:
+            idx = len(first_text)
+            unique_index[key] = idx
+            first_text.append(texts[i])
+        inverse[i] = idx
+
+    unique_keys = list(unique_index)
+    found = cache.get_many(unique_keys)
+    missing = [i for i, k in enumerate(unique_keys) if k not in found]
+    print(f"[+] Embedding cache: {len(found)} hits, {len(missing)} misses "
+          f"({len(texts)} rows, {len(unique_keys)} distinct texts)")
+
+    new_vectors = None
+    if missing:
+        new_vectors = np.asarray(encode_fn([first_text[i] for i in missing]), dtype=np.float32)
+        cache.put_many([unique_keys[i] for i in missing], new_vectors)
+
+    dim = new_vectors.shape[1] if new_vectors is not None else next(iter(found.values())).shape[0]
+    unique_vectors = np.empty((len(unique_keys), dim), dtype=np.float32)
+    for i, key in enumerate(unique_keys):
+        vec = found.get(key)
+        if vec is not None:
+            unique_vectors[i] = vec
+    if missing:
+        unique_vectors[missing] = new_vectors
+
+    return unique_vectors[inverse]
@@ -0,0 +1,178 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_PATH = "data/initial_embeddings.npy"
+STORE_DTYPES = ("float32", "float16", "int8")
+SCALES_SUFFIX = ".scales.npy"
+RESCORE_SUFFIX = ".f16.npy"
+BLOCK_ROWS = 65_536
+# Lossy scans shortlist this many times the requested k before rescoring
+RESCORE_FACTOR = 4
+# Cosine error of per-dimension int8 codes stays well below this on unit vectors
+INT8_MARGIN = 0.02
+
+
+def resolve_dtype(dtype=None):
+    dtype = dtype or os.getenv("TREX_EMBED_STORE", "float16")
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f"Unknown embedding store dtype '{dtype}'. Choose from {list(STORE_DTYPES)}.")
+    return dtype
+
+
+def sidecar(path, suffix):
+    return path[:-len(".npy")] + suffix
+
+
+def int8_scales(embeddings):
+    """Per-dimension (scale, offset) mapping each column's [min, max] onto [-127, 127]."""
+    lo = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+    hi = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+    for start in range(0, len(embeddings), BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + BLOCK_ROWS], dtype=np.float32)
+        lo = np.minimum(lo, block.min(axis=0))
+        hi = np.maximum(hi, block.max(axis=0))
+    scale = (hi - lo) / 254
+    scale[scale == 0] = 1.0
+    return np.stack([scale, (hi + lo) / 2]).astype(np.float32)
+
+
+def write_store(embeddings, path, dtype):
+    """Write float32 vectors as dtype codes to .tmp files, block by block; int8 also gets its scales
+    and a float16 copy for rescoring. swap_store() moves them into place."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    n, dim = embeddings.shape
+
+    targets = [np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=dtype, shape=(n, dim))]
+    if dtype == "int8":
+        scales = int8_scales(embeddings) if n else np.ones((2, dim), dtype=np.float32)
+        np.save(sidecar(path, SCALES_SUFFIX) + ".tmp.npy", scales)
+        targets.append(np.lib.format.open_memmap(sidecar(path, RESCORE_SUFFIX) + ".tmp", mode="w+",
+                                                 dtype=np.float16, shape=(n, dim)))
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + BLOCK_ROWS], dtype=np.float32)
+        for target in targets:
+            if target.dtype == np.int8:
+                target[start:start + len(block)] = np.clip(np.rint((block - scales[1]) / scales[0]), -127, 127)
+            else:
+                target[start:start + len(block)] = block
+    for target in targets:
+        target.flush()
+
+
+def swap_store(path, dtype):
+    # Sidecars first and codes last, so a crash in between leaves the old codes readable
+    if dtype == "int8":
+        os.replace(sidecar(path, SCALES_SUFFIX) + ".tmp.npy", sidecar(path, SCALES_SUFFIX))
+        os.replace(sidecar(path, RESCORE_SUFFIX) + ".tmp", sidecar(path, RESCORE_SUFFIX))
+    os.replace(path + ".tmp", path)
+    if dtype != "int8":
+        for suffix in (SCALES_SUFFIX, RESCORE_SUFFIX):
+            if os.path.exists(sidecar(path, suffix)):
+                os.remove(sidecar(path, suffix))
+    return path
+
+
+def save_store(embeddings, path=EMBEDDING_PATH, dtype=None):
+    dtype = resolve_dtype(dtype)
+    write_store(np.asarray(embeddings, dtype=np.float32), path, dtype)
+    return swap_store(path, dtype)
+
+
+def compact_store(path=EMBEDDING_PATH, dtype=None):
+    """Rewrite a float32 .npy (e.g. one filled by streaming) in the store dtype; a no-op if already there.
+
+    Callers must not hold the file memory-mapped, since it is replaced at the end.
+    """
+    dtype = resolve_dtype(dtype)
+    source = np.load(path, mmap_mode="r")
+    if source.dtype == np.dtype(dtype) and (dtype != "int8" or os.path.exists(sidecar(path, SCALES_SUFFIX))):
+        return path
+    if source.dtype == np.int8:
+        source = EmbeddingStore(path).full
+    write_store(source, path, dtype)
+    del source
+    return swap_store(path, dtype)
+
+
+class EmbeddingStore:
+    """Memory-mapped session embeddings in float32, float16 or int8 (per-dimension scale and offset).
+
+    Indexing returns float32 rows, so it stands in for the plain matrix in blocked code. int8 scans
+    are approximate; rerank() and pair_scores() rescore candidates against the float16 copy.
+    """
+
+    def __init__(self, path=EMBEDDING_PATH):
+        self.path = path
+        self.codes = np.load(path, mmap_mode="r")
+        self.scale = self.offset = None
+        self.full = self.codes
+        if self.codes.dtype == np.int8:
+            self.scale, self.offset = np.load(sidecar(path, SCALES_SUFFIX))
+            self.full = np.load(sidecar(path, RESCORE_SUFFIX), mmap_mode="r")
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def dtype(self):
+        return self.codes.dtype
+
+    @property
+    def lossy(self):
+        return self.scale is not None
+
+    @property
+    def margin(self):
+        return INT8_MARGIN if self.lossy else 0.0
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        codes = self.codes[key]
+        if self.scale is None:
+            return np.asarray(codes, dtype=np.float32)
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def scores(self, key, query):
+        """Inner products of the selected rows with query, folding the int8 scale and offset into the
+        query instead of dequantizing every row."""
+        codes = np.asarray(self.codes[key], dtype=np.float32)
+        if self.scale is None:
+            return codes @ query
+        return codes @ (query * self.scale) + self.offset @ query
+
+    def full_rows(self, ids):
+        return np.asarray(self.full[ids], dtype=np.float32)
+
+    def rerank(self, ids, query, k):
+        """Top-k of the candidate ids by inner product with the (normalized) query over the rescoring
+        copy: the stored vectors themselves, or the float16 copy for int8 codes."""
+        ids = np.sort(np.asarray(ids))
+        scores = self.full_rows(ids) @ query
+        best = np.argsort(-scores)[:k]
+        return ids[best], scores[best]
+
+    def pair_scores(self, left, right):
+        """Inner products of row pairs over the rescoring copy, in blocks."""
+        out = np.empty(len(left), dtype=np.float32)
+        for start in range(0, len(left), BLOCK_ROWS):
+            a = self.full_rows(left[start:start + BLOCK_ROWS])
+            b = self.full_rows(right[start:start + BLOCK_ROWS])
+            out[start:start + len(a)] = np.einsum("ij,ij->i", a, b)
+        return out
+
+
+def open_store(path=EMBEDDING_PATH):
+    return EmbeddingStore(path)
@@ -0,0 +1,83 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+BACKENDS = ['auto', 'cuda', 'cpu', 'cpu-int8']
+MIN_QUANT_SIMILARITY = 0.99
+
+
+def detect_device():
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def resolve_backend(backend=None):
+    backend = backend or os.getenv("TREX_EMBED_BACKEND", "auto")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Choose from {BACKENDS}.")
+    if backend == 'auto':
+        return 'cuda' if detect_device() == 'cuda' else 'cpu-int8'
+    if backend == 'cuda' and detect_device() != 'cuda':
+        print("[!] CUDA requested but not available, falling back to cpu-int8.")
+        return 'cpu-int8'
+    return backend
+
+
+def quantize_model(model):
+    # Dynamic int8 quantization of the transformer's Linear layers; weights are
+    # quantized once, activations per batch, so no calibration data is needed.
+    import torch
+    if 'fbgemm' in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = 'fbgemm'
+    transformer = model[0]
+    transformer.auto_model = torch.quantization.quantize_dynamic(
+        transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    return model
+
+
+def load_model(backend=None, model_name=MODEL_NAME, verbose=True):
+    # torch and sentence-transformers take seconds to import, so they load with the model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    backend = resolve_backend(backend)
+    device = 'cuda' if backend == 'cuda' else 'cpu'
+
+    model = SentenceTransformer(model_name, device=device)
+    if backend == 'cpu-int8':
+        quantize_model(model)
+    if device == 'cpu':
+        torch.set_num_threads(os.cpu_count() or 1)
+
+    model.trex_backend = backend
+    model.trex_device = device
+    model.trex_cache_name = model_name if backend != 'cpu-int8' else f"{model_name}:int8"
+    if verbose:
+        print(f"[+] Loaded {model_name} on {device} ({backend} backend)")
+    return model
+
+
+def quantization_similarity(model, texts, model_name=MODEL_NAME):
+    """Cosine similarity between a quantized model's vectors and the fp32 reference on the same texts."""
+    from sentence_transformers import SentenceTransformer
+    reference = SentenceTransformer(model_name, device='cpu')
+    ref = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    quant = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return np.sum(ref * quant, axis=1)
+
+
+def check_quantized_accuracy(model, texts, threshold=MIN_QUANT_SIMILARITY):
+    if getattr(model, 'trex_backend', None) != 'cpu-int8' or not texts:
+        return True
+
+    sims = quantization_similarity(model, texts)
+    print(f"[+] int8 vs fp32 cosine similarity on {len(texts)} texts: "
+          f"mean={sims.mean():.4f}, min={sims.min():.4f}")
+    if sims.mean() < threshold:
+        print(f"[!] Quantized model is below the {threshold} similarity threshold.")
+        return False
+    return True
@@ -0,0 +1,91 @@
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+import emoji
+from app.token_cache import get_token_cache
+from app.profiling import span
+
+FEATURE_COLUMNS = ['word_count', 'char_count', 'entropy', 'token_count',
+                   'stopword_count', 'junk_count', 'emoji_count', 'other_count']
+CHUNK_ROWS = 50_000
+PARALLEL_MIN_ROWS = 100_000
+
+
+def codepoints(texts):
+    codes = [np.frombuffer(t.encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32) for t in texts]
+    lengths = np.array([len(c) for c in codes], dtype=np.int64)
+    doc = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    chars = np.concatenate(codes).astype(np.int64) if len(codes) else np.empty(0, dtype=np.int64)
+    return doc, chars, lengths
+
+
+def char_entropy(doc, chars, lengths):
+    """Shannon entropy (bits) of each text's character distribution, without a per-row Counter."""
+    entropy = np.zeros(len(lengths), dtype=np.float64)
+    if len(chars) == 0:
+        return entropy
+    # Count every (doc, char) pair at once, then sum -p*log2(p) back per doc
+    _, first, counts = np.unique(doc * 0x110000 + chars, return_index=True, return_counts=True)
+    pair_doc = doc[first]
+    p = counts / lengths[pair_doc]
+    np.add.at(entropy, pair_doc, -p * np.log2(p))
+    return entropy
+
+
+def emoji_counts(doc, chars, n_docs):
+    # Each distinct character is checked once, then matches are counted per doc
+    distinct = np.unique(chars)
+    emoji_codes = [c for c in distinct if emoji.is_emoji(chr(c))]
+    is_emoji = np.isin(chars, emoji_codes)
+    return np.bincount(doc[is_emoji], minlength=n_docs)
+
+
+def chunk_features(texts):
+    series = pd.Series(texts, dtype=object)
+    doc, chars, lengths = codepoints(texts)
+    emoji_count = emoji_counts(doc, chars, len(texts))
+    return pd.DataFrame({
+        'word_count': series.str.split().str.len().to_numpy(),
+        'char_count': series.str.len().to_numpy(),
+        'entropy': char_entropy(doc, chars, lengths),
+        'junk_count': series.str.count(r"[^\w\s]").to_numpy() - emoji_count,
+        'emoji_count': emoji_count,
+    })
+
+
+def compute_text_features(texts, stopword_set, workers=None, cache_tokens=True):
+    """All per-row text statistics used by EDA, dedup and clustering, in one pass over the corpus.
+
+    cache_tokens=False keeps the tokenization out of the on-disk token cache (see get_token_cache).
+    """
+    texts = [str(t) for t in texts]
+    chunks = [texts[i:i + CHUNK_ROWS] for i in range(0, len(texts), CHUNK_ROWS)] or [[]]
+    workers = workers or os.cpu_count() or 1
+
+    with span("text_features", rows=len(texts)):
+        if workers == 1 or len(texts) < PARALLEL_MIN_ROWS:
+            parts = [chunk_features(chunk) for chunk in chunks]
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(min(workers, len(chunks))) as pool:
+                parts = pool.map(chunk_features, chunks)
+    features = pd.concat(parts, ignore_index=True)
+
+    # Token-based counts come from the shared token cache instead of re-tokenizing
+    tokens = get_token_cache(texts, persist=cache_tokens)
+    features['token_count'] = tokens.token_counts()
+    features['stopword_count'] = tokens.stopword_counts(stopword_set)
+    features['other_count'] = np.maximum(
+        features['token_count'] - features['stopword_count'] - features['junk_count'] - features['emoji_count'], 0)
+    return features[FEATURE_COLUMNS]
+
+
+def ensure_text_features(df, text_col, stopword_set):
+    """Add any missing feature columns to df in place; a no-op when they were persisted upstream."""
+    missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        features = compute_text_features(df[text_col].tolist(), stopword_set)
+        for col in missing:
+            df[col] = features[col].to_numpy()
+    return df
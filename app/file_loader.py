@@ -1,11 +1,26 @@
-import pandas as pd
-import os
+from app.ingest import csv_options, read_sample, ingest_csv
+from app.session_store import save_table
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
 
 
 SUPPORTED_TYPES = ['str', 'int', 'float', 'bool', 'category']
 
+class CSVSource:
+    """A CSV file and its read settings. Only a sample is held in memory until the columns are chosen."""
+
+    def __init__(self, filepath, encoding='utf-8', delimiter=',', header=0, column_names=None):
+        self.filepath = filepath
+        self.options = csv_options(encoding, delimiter, header, column_names)
+        self.sample = read_sample(filepath, **self.options)
+
+    @property
+    def columns(self):
+        return list(self.sample.columns)
+
+    def load(self, text_col, meta_cols, cast_types=None, rename=None):
+        return ingest_csv(self.filepath, text_col, meta_cols, cast_types, rename, **self.options)
+
 def popup_csv_loader():
     root = tk.Tk()
     root.withdraw()
@@ -42,51 +57,37 @@ def popup_csv_loader():
                 header = 0
                 column_names = None
 
-            df = pd.read_csv(filepath, encoding=encoding, delimiter=delimiter, header=header)
-
-            if column_names:
-                df.columns = column_names
-
-            os.makedirs("data", exist_ok=True)
-            save_path = os.path.join("data", "entry_file.csv")
-            df.to_csv(save_path, index=False)
+            # The full file is read later, once, for just the columns picked in the setup window
+            source = CSVSource(filepath, encoding, delimiter, header, column_names)
             messagebox.showinfo("Success", f"Accepted file type.")
-            return df
+            return source
 
         except Exception as e:
             messagebox.showerror("Load Failed", f"{str(e)}\n\nPlease enter valid inputs.")
             continue
 
-def trex_start(input_df):
+def trex_start(source):
     import traceback
 
     df_holder = {"df": None}
     text_column_holder = {"name": None}
-    df = input_df.copy()
     cast_types = {}
 
     def on_confirm():
         try:
-            new_columns = [entry.get() for entry in rename_entries]
-            df.columns = new_columns
+            rename = {old: entry.get() for old, entry in zip(columns, rename_entries)}
 
-            selected_text = text_col.get()
+            # The lists show the original names; everything downstream uses the new ones
+            selected_text = rename.get(text_col.get())
             text_column_holder["name"] = selected_text
-            selected_meta = [meta_listbox.get(i) for i in meta_listbox.curselection()]
+            selected_meta = [rename[meta_listbox.get(i)] for i in meta_listbox.curselection()]
             if not selected_text or not selected_meta:
                 messagebox.showerror("Missing Selection", "Please select a text column and at least one metadata column.")
                 return
 
-            all_selected = [selected_text] + selected_meta
-            df_filtered = df[all_selected].copy()
-
-            for col in selected_meta:
-                cast_type = cast_types[col].get()
-                if cast_type:
-                    df_filtered[col] = df_filtered[col].astype(cast_type)
-
-            df_filtered.insert(0, 'row_id', df_filtered.index)
-            df_filtered.to_csv("data/trex_start.csv", index=False)
+            df_filtered = source.load(selected_text, selected_meta,
+                                      {rename[old]: var.get() for old, var in cast_types.items()}, rename)
+            save_table(df_filtered, "start")
             messagebox.showinfo("Success", "File loaded.")
             df_holder["df"] = df_filtered
             popup.quit()
@@ -110,7 +111,7 @@ def trex_start(input_df):
     canvas.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    columns = list(df.columns)
+    columns = source.columns
     rename_entries = []
 
     tk.Label(scroll_frame, text="Rename Columns").pack()
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_object_dtype, is_string_dtype
+from app.profiling import span
+
+SAMPLE_ROWS = 10_000
+CHUNK_ROWS = 200_000
+# Metadata columns whose sample has few distinct values relative to its length are read as categoricals
+CATEGORY_MAX_UNIQUE = 1_000
+CATEGORY_MAX_SHARE = 0.5
+# Casts a column already satisfies when its dtype is of this kind (e.g. an int8 column for 'int')
+CAST_KINDS = {"int": np.integer, "float": np.floating, "bool": np.bool_}
+
+
+def csv_options(encoding='utf-8', delimiter=',', header=0, column_names=None):
+    """read_csv keyword arguments for the loader's settings; column_names replaces the header names."""
+    options = {"encoding": encoding, "sep": delimiter, "header": header}
+    if column_names:
+        options["names"] = list(column_names)
+    return options
+
+
+def read_sample(filepath, nrows=SAMPLE_ROWS, usecols=None, **options):
+    return pd.read_csv(filepath, nrows=nrows, usecols=usecols, **options)
+
+
+def infer_dtypes(sample, text_cols=()):
+    """read_csv dtypes from a sample: low-cardinality string columns become categoricals.
+
+    Numeric columns are left to read_csv and shrunk per chunk, since a sample cannot prove their range.
+    """
+    dtypes = {}
+    for col in sample.columns:
+        if col in text_cols or not (is_object_dtype(sample[col]) or is_string_dtype(sample[col])):
+            continue
+        values = sample[col].dropna()
+        unique = values.nunique()
+        if unique <= CATEGORY_MAX_UNIQUE and unique <= CATEGORY_MAX_SHARE * max(len(values), 1):
+            dtypes[col] = "category"
+    return dtypes
+
+
+def shrink_numeric(df):
+    """Downcast integer columns to the smallest type that holds them, and floats to float32 when lossless."""
+    for col in df.columns:
+        values = df[col]
+        if is_integer_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+            df[col] = pd.to_numeric(values, downcast="integer")
+        elif is_float_dtype(values) and values.dtype != np.float32:
+            as32 = values.astype(np.float32)
+            if np.array_equal(as32.to_numpy(np.float64), values.to_numpy(), equal_nan=True):
+                df[col] = as32
+    return df
+
+
+def unify_categories(chunks):
+    # Chunks see different category sets; concat keeps the categorical dtype only if they all agree
+    for col in chunks[0].columns:
+        if not all(isinstance(c[col].dtype, pd.CategoricalDtype) for c in chunks):
+            continue
+        categories = pd.Index(pd.unique(np.concatenate([c[col].cat.categories.to_numpy(object) for c in chunks])))
+        for c in chunks:
+            c[col] = c[col].cat.set_categories(categories)
+    return chunks
+
+
+def combine_chunks(chunks):
+    """Concatenate chunk frames one column at a time, dropping each column from the chunks once it is
+    combined, so the overhead is about one column rather than a second copy of the whole frame."""
+    columns = list(chunks[0].columns)
+    df = pd.DataFrame(index=pd.RangeIndex(sum(len(c) for c in chunks)))
+    for col in columns:
+        parts = [c.pop(col) for c in chunks]
+        df[col] = pd.concat(parts, ignore_index=True)
+        del parts
+    return df
+
+
+def read_csv_chunked(filepath, usecols=None, text_cols=(), chunksize=CHUNK_ROWS, sample_rows=SAMPLE_ROWS, **options):
+    """Read only usecols, chunk by chunk, with dtypes inferred from a sample and numerics shrunk.
+
+    Each raw chunk is discarded once converted, and the chunks are combined column by column, so
+    peak memory stays close to the compact result instead of a full object-dtype copy of the file.
+    """
+    dtypes = infer_dtypes(read_sample(filepath, sample_rows, usecols, **options), text_cols)
+    chunks = []
+    for chunk in pd.read_csv(filepath, usecols=usecols, dtype=dtypes, chunksize=chunksize, **options):
+        chunks.append(shrink_numeric(chunk))
+    if not chunks:
+        return read_sample(filepath, 0, usecols, **options)
+    df = combine_chunks(unify_categories(chunks))
+    # Chunks that disagree (ints in one, floats with NaN in another) concatenate to the wider type
+    return shrink_numeric(df)
+
+
+def satisfies(dtype, cast_type):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return cast_type == "category"
+    kind = CAST_KINDS.get(cast_type)
+    return kind is not None and isinstance(dtype, np.dtype) and np.issubdtype(dtype, kind)
+
+
+def apply_casts(df, cast_types):
+    """Apply the requested per-column casts in place (one column at a time, never a full-frame copy).
+
+    Columns whose dtype already is of the requested kind are left alone, so an 'int' cast keeps the
+    int8 that shrink_numeric chose; integer casts are shrunk again afterwards.
+    """
+    for col, cast_type in (cast_types or {}).items():
+        if not cast_type or col not in df.columns or satisfies(df[col].dtype, cast_type):
+            continue
+        df[col] = df[col].astype(cast_type)
+        if cast_type == "int":
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def ingest_csv(filepath, text_col, meta_cols, cast_types=None, rename=None, chunksize=CHUNK_ROWS, **options):
+    """Load the text and metadata columns of a CSV, ready to save as the session's start table.
+
+    text_col, meta_cols and cast_types use the names after rename (original name -> new name).
+    """
+    original = {new: old for old, new in (rename or {}).items()}
+    selected = [text_col] + [c for c in meta_cols if c != text_col]
+    usecols = [original.get(c, c) for c in selected]
+
+    with span("ingest_csv") as s:
+        df = read_csv_chunked(filepath, usecols=usecols, text_cols=[original.get(text_col, text_col)],
+                              chunksize=chunksize, **options)
+        df.columns = [(rename or {}).get(c, c) for c in df.columns]
+        df = df[selected] if list(df.columns) != selected else df
+        apply_casts(df, {c: t for c, t in (cast_types or {}).items() if c in meta_cols})
+        df.insert(0, 'row_id', np.arange(len(df)))
+        s["rows"] = len(df)
+    return df
@@ -0,0 +1,14 @@
+import matplotlib.pyplot as plt
+
+
+def show(interactive=True, fig=None):
+    # Batch runs render off-screen, so there is nothing to show
+    if interactive:
+        fig.show() if fig is not None else plt.show()
+
+
+def confirm(prompt, interactive=True, default=True):
+    """Ask a y/n question; non-interactive runs take the default answer without prompting."""
+    if not interactive:
+        return default
+    return input(prompt).strip().lower() == 'y'
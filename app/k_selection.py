@@ -0,0 +1,103 @@
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+
+K_MIN, K_MAX = 2, 20
+SAMPLE_SIZE = 20_000
+SILHOUETTE_SAMPLE = 5_000
+N_STRATA = 32
+# Warm starts only carry over within a worker's run of ks, so each worker gets at least this many
+MIN_KS_PER_WORKER = 3
+BLOCK_ROWS = 65_536
+
+
+def coarse_strata(X, n_strata=N_STRATA, seed=42):
+    """Cheap partition of all rows into regions, so the subsample keeps small regions represented."""
+    rng = np.random.default_rng(seed)
+    train = np.sort(rng.choice(len(X), size=min(len(X), 10_000), replace=False))
+    km = MiniBatchKMeans(n_clusters=min(n_strata, len(train)), batch_size=1024, n_init=1, random_state=seed)
+    km.fit(np.asarray(X[train]))
+    return np.concatenate([km.predict(np.asarray(X[s:s + BLOCK_ROWS])) for s in range(0, len(X), BLOCK_ROWS)])
+
+
+def stratified_sample(n, size, strata, seed=42):
+    """Row indices drawn proportionally from each stratum (at least one per non-empty stratum)."""
+    if size >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    picked = []
+    for s in np.unique(strata):
+        members = np.flatnonzero(strata == s)
+        take = max(1, int(round(size * len(members) / n)))
+        picked.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def next_init(sample, centroids):
+    # Warm start for k+1: keep the k centroids and add the sample point farthest from all of them
+    sq_dist = np.sum(sample ** 2, axis=1)[:, None] - 2 * sample @ centroids.T + np.sum(centroids ** 2, axis=1)
+    return np.vstack([centroids, sample[np.argmax(sq_dist.min(axis=1))]])
+
+
+def sweep_chunk(sample, ks, seed=42):
+    """Fit consecutive k values on the sample, reusing each fit's centroids to initialize the next."""
+    from threadpoolctl import threadpool_limits
+
+    rows = []
+    centroids = None
+    rng = np.random.default_rng(seed)
+    sil_idx = rng.choice(len(sample), size=min(len(sample), SILHOUETTE_SAMPLE), replace=False)
+    with threadpool_limits(1):
+        for k in ks:
+            init = next_init(sample, centroids) if centroids is not None and len(centroids) == k - 1 else 'k-means++'
+            km = MiniBatchKMeans(n_clusters=k, batch_size=1024, n_init=1, init=init, random_state=seed)
+            labels = km.fit_predict(sample)
+            centroids = km.cluster_centers_
+            single = len(np.unique(labels)) < 2
+            rows.append({
+                'k': k,
+                'inertia': km.inertia_,
+                'davies_bouldin': np.nan if single else davies_bouldin_score(sample, labels),
+                'calinski_harabasz': np.nan if single else calinski_harabasz_score(sample, labels),
+                'silhouette': np.nan if len(np.unique(labels[sil_idx])) < 2 else silhouette_score(sample[sil_idx], labels[sil_idx]),
+            })
+    return rows
+
+
+def recommend_k(results):
+    """Elbow by the kneedle rule: the k whose normalized inertia lies farthest below the chord."""
+    ks = results['k'].to_numpy(dtype=float)
+    inertia = results['inertia'].to_numpy(dtype=float)
+    if len(ks) < 3 or inertia.max() == inertia.min():
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertia - inertia.min()) / (inertia.max() - inertia.min())
+    return int(ks[np.argmax((1 - x) - y)])
+
+
+def k_sweep(X, k_min=K_MIN, k_max=K_MAX, sample_size=SAMPLE_SIZE, workers=None, seed=42):
+    """Inertia and cheap quality metrics for every k on a stratified subsample, fitted in parallel."""
+    n = len(X)
+    k_max = min(k_max, n - 1)
+    if k_max < k_min:
+        raise ValueError(f"Need at least {k_min + 1} rows to choose between cluster counts, got {n}.")
+    ks = list(range(k_min, k_max + 1))
+    strata = coarse_strata(X, seed=seed) if n > sample_size else np.zeros(n, dtype=int)
+    sample = np.ascontiguousarray(X[stratified_sample(n, sample_size, strata, seed)], dtype=np.float32)
+
+    workers = min(workers or os.cpu_count() or 1, max(1, len(ks) // MIN_KS_PER_WORKER))
+    chunks = [list(c) for c in np.array_split(ks, workers) if len(c)]
+    if workers == 1:
+        rows = sweep_chunk(sample, ks, seed)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(len(chunks)) as pool:
+            rows = [r for part in pool.starmap(sweep_chunk, [(sample, c, seed) for c in chunks]) for r in part]
+
+    results = pd.DataFrame(rows).sort_values('k').reset_index(drop=True)
+    # Report inertia at full-data scale so it is comparable with a fit on all rows
+    results['inertia'] *= n / len(sample)
+    return results
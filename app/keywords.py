@@ -0,0 +1,52 @@
+import numpy as np
+from scipy import sparse
+from app.registry import get_stopwords
+
+
+def document_term_matrix(tokens, stopword_set):
+    """Sparse docs x terms count matrix over lowercased, alphabetic, non-stopword tokens of the token cache."""
+    lower_ids, lower_vocab = tokens.lower_ids()
+    allowed = np.array([w.isalpha() and w not in stopword_set for w in lower_vocab], dtype=bool)
+
+    # Re-number the allowed terms densely so the matrix has no empty columns
+    term_ids = np.full(len(lower_vocab), -1, dtype=np.int64)
+    term_ids[allowed] = np.arange(allowed.sum())
+    terms = [w for w, keep in zip(lower_vocab, allowed) if keep]
+
+    cols = term_ids[lower_ids]
+    keep = cols >= 0
+    dtm = sparse.csr_matrix(
+        (np.ones(keep.sum(), dtype=np.float64), (tokens.doc_index()[keep], cols[keep])),
+        shape=(len(tokens), len(terms))
+    )
+    dtm.sum_duplicates()
+    return dtm, terms
+
+
+def c_tf_idf(class_counts):
+    """Class-based TF-IDF: term frequency within each cluster, weighted by log(1 + avg cluster size / term frequency)."""
+    class_counts = sparse.csr_matrix(class_counts)
+    sizes = np.asarray(class_counts.sum(axis=1)).ravel()
+    tf = sparse.diags(1 / np.maximum(sizes, 1)) @ class_counts
+    term_freq = np.asarray(class_counts.sum(axis=0)).ravel()
+    idf = np.log(1 + sizes.mean() / np.maximum(term_freq, 1))
+    return tf @ sparse.diags(idf)
+
+
+def cluster_keywords(tokens, labels, k, topn=10):
+    """Top c-TF-IDF terms of every cluster as [(term, score), ...], from one sparse aggregation."""
+    labels = np.asarray(labels)
+
+    dtm, terms = document_term_matrix(tokens, get_stopwords())
+    # One k x n indicator times the n x V matrix sums term counts per cluster
+    membership = sparse.csr_matrix(
+        (np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(k, len(labels))
+    )
+    scores = c_tf_idf(membership @ dtm)
+
+    keywords = []
+    for i in range(k):
+        row = scores.getrow(i)
+        top = np.argsort(-row.data, kind="stable")[:topn]
+        keywords.append([(terms[row.indices[j]], float(row.data[j])) for j in top])
+    return keywords
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CACHE_PATH = "data/llm_cache.db"
+TTL_SECONDS = 30 * 24 * 3600
+MAX_ENTRIES = 50_000
+
+_cache = None
+
+
+def request_key(url, payload):
+    """Stable key of a chat request: the endpoint, plus model, messages, temperature, max_tokens and any
+    other sampling fields. The endpoint keeps replies from a local stand-in out of real runs."""
+    canonical = json.dumps({"url": url, "payload": payload}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+class LLMCache:
+    """Disk-backed cache of chat-completion replies with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key BLOB PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self.conn.commit()
+
+    def get(self, url, payload):
+        key = request_key(url, payload)
+        row = self.conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+            self.misses += 1
+            return None
+
+        self.conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        self.conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, url, payload, content):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, content, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (request_key(url, payload), payload.get("model", ""), content, now, now)
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        removed = self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            removed += self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            ).rowcount
+        self.conn.commit()
+        return removed
+
+    def stats(self):
+        entries, lifetime_hits = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lifetime_hits": lifetime_hits,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def get_cache(path=CACHE_PATH):
+    """The session's LLM cache, opened on first use and shared by every LLM caller."""
+    global _cache
+    if _cache is None or _cache.path != path:
+        _cache = LLMCache(path)
+    return _cache
+
+
+def print_stats(cache=None):
+    s = (cache or get_cache()).stats()
+    print(f"[+] LLM cache: {s['hits']} hits, {s['misses']} misses "
+          f"({s['hit_rate']:.0%} hit rate, {s['entries']} entries stored)")
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import random
+import time
+import httpx
+from dotenv import load_dotenv
+from app.llm_cache import get_cache
+from app.profiling import span
+
+load_dotenv()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+MODEL = "llama3-70b-8192"
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", 30))
+MAX_RETRIES = 4
+# Requests per call when replies are validated (the labeller used to try three times)
+VALIDATE_ATTEMPTS = 3
+TIMEOUT = 30
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Async rate limiter: bursts up to capacity, then one request every 60 / rate seconds.
+
+    The rate, not MAX_CONCURRENCY, sets throughput once the burst is spent: at the default
+    30 requests/minute (burst 5), 100 requests take about 190 s however many run at once.
+    """
+
+    def __init__(self, requests_per_minute, capacity=None):
+        self.rate = requests_per_minute / 60
+        self.capacity = capacity or max(1, requests_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=20.0):
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    try:
+        return max(delay, float(retry_after)) if retry_after is not None else delay
+    except ValueError:
+        return delay
+
+
+class LLMClient:
+    """Chat-completions client sharing one pooled AsyncClient, with bounded concurrency and rate limiting.
+
+    Use as an async context manager; the endpoint defaults to GROQ_API_URL so a local
+    stand-in server can replace the real API. Replies are served from the session's
+    LLM cache when the identical request was answered before.
+    """
+
+    def __init__(self, url=API_URL, api_key=GROQ_API_KEY, max_concurrency=MAX_CONCURRENCY,
+                 requests_per_minute=REQUESTS_PER_MINUTE, max_retries=MAX_RETRIES, timeout=TIMEOUT, use_cache=True):
+        self.url = url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache = get_cache() if use_cache else None
+        self.client = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.bucket = TokenBucket(self.requests_per_minute)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.client = None
+
+    async def chat(self, messages, model=MODEL, temperature=0.3, max_tokens=200, validate=None,
+                   validate_attempts=VALIDATE_ATTEMPTS, **extra):
+        """Content of the first choice; retries transport errors and retryable statuses, raises LLMError otherwise.
+
+        validate(content) -> bool rejects unusable replies (e.g. a label that does not parse): they are
+        re-requested up to validate_attempts times, never cached, and a cached reply that fails is ignored.
+        """
+        payload = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens, **extra}
+        cached = self.cache.get(self.url, payload) if self.cache else None
+        if cached is not None and (validate is None or validate(cached)):
+            return cached
+
+        for attempt in range(validate_attempts if validate else 1):
+            content = await self.request(payload)
+            if validate is None or validate(content):
+                if self.cache:
+                    self.cache.put(self.url, payload, content)
+                return content
+            print(f"[!] Unusable reply (attempt {attempt + 1}): {content[:80]!r}")
+        raise LLMError(f"No usable reply after {validate_attempts} attempts: {content[:200]!r}")
+
+    async def request(self, payload):
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            await self.bucket.acquire()
+            async with self.semaphore:
+                try:
+                    res = await self.client.post(self.url, json=payload)
+                except httpx.TransportError as e:
+                    error = f"HTTP error: {e!r}"
+                except httpx.HTTPError as e:
+                    raise LLMError(f"HTTP error: {e!r}") from e
+                else:
+                    if res.status_code == 200:
+                        try:
+                            return res.json()["choices"][0]["message"]["content"]
+                        except (ValueError, LookupError, TypeError) as e:
+                            raise LLMError(f"Malformed response: {e!r} in {res.text[:200]}") from e
+                    error = f"{res.status_code} - {res.text}"
+                    if res.status_code not in RETRY_STATUS:
+                        raise LLMError(error)
+                    retry_after = res.headers.get("retry-after")
+            if attempt < self.max_retries:
+                print(f"[!] Retry {attempt + 1} after: {error}")
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise LLMError(error)
+
+    async def chat_many(self, requests):
+        """Run chat(**request) for every request concurrently; failed requests yield their exception."""
+        return await asyncio.gather(*(self.chat(**r) for r in requests), return_exceptions=True)
+
+
+class SyncLLMClient:
+    """LLMClient for synchronous code, kept open across calls so connections and the rate limit
+    carry over (e.g. one per Text2SQL session). Use as a context manager."""
+
+    def __init__(self, **client_kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.client = LLMClient(**client_kwargs)
+        self.loop.run_until_complete(self.client.__aenter__())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def chat(self, messages, **kwargs):
+        with span("llm_call", rows=1):
+            return self.loop.run_until_complete(self.client.chat(messages, **kwargs))
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.run_until_complete(self.client.__aexit__(None, None, None))
+            self.loop.close()
+
+
+def chat_sync(messages, use_cache=True, **kwargs):
+    """One chat completion from synchronous code; repeated callers should hold a SyncLLMClient instead."""
+    with SyncLLMClient(use_cache=use_cache) as client:
+        return client.chat(messages, **kwargs)
+
+
+def chat_many_sync(requests, **client_kwargs):
+    """Concurrent chat completions from synchronous code.
+
+    Total latency approaches that of the slowest call only while the requests fit in the rate
+    limiter's burst; beyond it they are paced at GROQ_REQUESTS_PER_MINUTE (see TokenBucket).
+    """
+    async def run():
+        async with LLMClient(**client_kwargs) as client:
+            return await client.chat_many(requests)
+    with span("llm_calls", rows=len(requests)):
+        return asyncio.run(run())
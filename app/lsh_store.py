@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import time
+import numpy as np
+from app.minhash import template, NUM_PERM, THRESHOLD
+from app.profiling import span
+from datasketch import MinHashLSH
+
+INDEX_DIR = "data/lsh_index"
+HASH_PRIME = np.uint64(1099511628211)
+
+
+def band_hashes(signatures, b, r):
+    """64-bit hash of every LSH band of every signature (n x b), vectorized over documents."""
+    sig = signatures.astype(np.uint64)
+    out = np.empty((len(signatures), b), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for band in range(b):
+            h = np.full(len(signatures), np.uint64(band + 1))
+            for col in range(band * r, (band + 1) * r):
+                h = h * HASH_PRIME + sig[:, col] + np.uint64(1)
+            out[:, band] = h
+    return out.view(np.int64)
+
+
+class LSHStore:
+    """On-disk MinHash LSH index that can be reopened, queried and appended to batch by batch.
+
+    Signatures live in an append-only binary file (one fixed-size row per document);
+    band buckets and document keys live in SQLite, so a query or append touches only
+    the rows of the incoming batch and their bucket matches.
+    """
+
+    def __init__(self, path=INDEX_DIR, threshold=THRESHOLD, num_perm=NUM_PERM):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.sig_path = os.path.join(path, "signatures.bin")
+        self.conn = sqlite3.connect(os.path.join(path, "index.db"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id INTEGER PRIMARY KEY, key TEXT UNIQUE, batch TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (band INTEGER, hash INTEGER, doc_id INTEGER, "
+            "PRIMARY KEY (band, hash, doc_id)) WITHOUT ROWID"
+        )
+
+        meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        if meta:
+            if int(meta["num_perm"]) != num_perm or float(meta["threshold"]) != threshold:
+                raise ValueError(f"Index at {path} was built with num_perm={meta['num_perm']}, "
+                                 f"threshold={meta['threshold']}")
+            self.b, self.r = int(meta["b"]), int(meta["r"])
+            self.dtype = np.dtype(meta["dtype"])
+        else:
+            lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+            self.b, self.r = lsh.b, lsh.r
+            self.dtype = template(num_perm).hashvalues.dtype
+            self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("num_perm", str(num_perm)), ("threshold", str(threshold)),
+                ("b", str(self.b)), ("r", str(self.r)), ("dtype", self.dtype.name)
+            ])
+            self.conn.commit()
+        self.num_perm = num_perm
+        self.threshold = threshold
+
+    def __len__(self):
+        # doc_ids are dense, so MAX is an O(1) primary-key lookup where COUNT(*) would scan
+        return self.conn.execute("SELECT COALESCE(MAX(doc_id) + 1, 0) FROM docs").fetchone()[0]
+
+    def signatures(self):
+        if not os.path.exists(self.sig_path) or os.path.getsize(self.sig_path) == 0:
+            return np.empty((0, self.num_perm), dtype=self.dtype)
+        return np.memmap(self.sig_path, dtype=self.dtype, mode="r").reshape(-1, self.num_perm)
+
+    def query(self, signatures):
+        """Best match in the stored corpus for each signature: (doc_id or -1, estimated Jaccard)."""
+        best_doc = np.full(len(signatures), -1, dtype=np.int64)
+        best_sim = np.zeros(len(signatures), dtype=np.float64)
+        if len(signatures) == 0 or len(self) == 0:
+            return best_doc, best_sim
+
+        hashes = band_hashes(signatures, self.b, self.r)
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS probe (qid INTEGER, band INTEGER, hash INTEGER)")
+        self.conn.execute("DELETE FROM probe")
+        self.conn.executemany(
+            "INSERT INTO probe (qid, band, hash) VALUES (?, ?, ?)",
+            ((q, band, int(hashes[q, band])) for q in range(len(signatures)) for band in range(self.b))
+        )
+        pairs = np.array(self.conn.execute(
+            "SELECT DISTINCT p.qid, b.doc_id FROM probe p JOIN buckets b ON b.band = p.band AND b.hash = p.hash"
+        ).fetchall(), dtype=np.int64).reshape(-1, 2)
+        self.conn.execute("DELETE FROM probe")
+        if len(pairs) == 0:
+            return best_doc, best_sim
+
+        stored = self.signatures()
+        sims = (stored[pairs[:, 1]] == signatures[pairs[:, 0]]).mean(axis=1)
+        order = np.lexsort((-sims, pairs[:, 0]))
+        qids, first = np.unique(pairs[order, 0], return_index=True)
+        best_doc[qids] = pairs[order[first], 1]
+        best_sim[qids] = sims[order[first]]
+        return best_doc, best_sim
+
+    def append(self, keys, signatures, batch=None):
+        """Add documents; keys already in the index are skipped. Returns the number added."""
+        batch = batch or time.strftime("%Y-%m-%dT%H:%M:%S")
+        keys = [str(k) for k in keys]
+        existing = set()
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            existing.update(k for (k,) in self.conn.execute(
+                f"SELECT key FROM docs WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        keep = np.array([k not in existing for k in keys], dtype=bool)
+        if not keep.any():
+            return 0
+
+        signatures = np.ascontiguousarray(signatures[keep], dtype=self.dtype)
+        keys = [k for k, kept in zip(keys, keep) if kept]
+        first_id = len(self)
+        doc_ids = np.arange(first_id, first_id + len(keys))
+        hashes = band_hashes(signatures, self.b, self.r)
+
+        with open(self.sig_path, "ab") as f:
+            f.seek(first_id * self.num_perm * self.dtype.itemsize)
+            f.truncate()
+            f.write(signatures.tobytes())
+        self.conn.executemany("INSERT INTO docs (doc_id, key, batch) VALUES (?, ?, ?)",
+                              ((int(d), k, batch) for d, k in zip(doc_ids, keys)))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO buckets (band, hash, doc_id) VALUES (?, ?, ?)",
+            ((band, int(hashes[i, band]), int(doc_ids[i])) for i in range(len(keys)) for band in range(self.b))
+        )
+        self.conn.commit()
+        return len(keys)
+
+    def keys_for(self, doc_ids):
+        wanted = sorted({int(d) for d in doc_ids if d >= 0})
+        lookup = {}
+        for start in range(0, len(wanted), 900):
+            chunk = wanted[start:start + 900]
+            lookup.update(self.conn.execute(
+                f"SELECT doc_id, key FROM docs WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk))
+        return [lookup.get(int(d)) for d in doc_ids]
+
+    def close(self):
+        self.conn.close()
+
+
+def dedup_against_index(df, signatures, codes, path=INDEX_DIR, batch=None):
+    """Tag rows of df that duplicate the stored corpus, then add the batch's new content to the index.
+
+    signatures holds one row per distinct text and codes maps each row of df to it, as
+    returned by dedup_groups.group_duplicates. Adds seen_status (new / seen_exact /
+    seen_near) and seen_match_key. Returns the number of documents appended.
+    """
+    batch = batch or time.strftime("%Y-%m-%dT%H:%M:%S")
+    store = LSHStore(path)
+    try:
+        with span("lsh_index_query", rows=len(signatures)):
+            doc, sim = store.query(signatures)
+        status = np.where(doc < 0, 'new', np.where(sim == 1.0, 'seen_exact', 'seen_near'))
+        matched = np.array(store.keys_for(doc), dtype=object)
+        df['seen_status'] = status[codes]
+        df['seen_match_key'] = matched[codes]
+
+        # Exact matches add nothing to the index; everything else becomes searchable for later batches
+        first_rows = np.unique(codes, return_index=True)[1]
+        keys = np.array([f"{batch}:{r}" for r in df['row_id'].to_numpy()[first_rows]], dtype=object)
+        fresh = status != 'seen_exact'
+        with span("lsh_index_append", rows=int(fresh.sum())):
+            return store.append(keys[fresh].tolist(), signatures[fresh], batch)
+    finally:
+        store.close()
@@ -0,0 +1,134 @@
+import os
+import multiprocessing
+import numpy as np
+from datasketch import MinHash, MinHashLSH
+
+NUM_PERM = 128
+THRESHOLD = 0.8
+PARALLEL_MIN_TOKENS = 50_000
+TOKEN_CHUNK = 20_000
+DOC_BLOCK_TOKENS = 1_000_000
+
+_template = None
+
+
+def template(num_perm=NUM_PERM):
+    # One empty MinHash per process; its permutations are reused for every token
+    global _template
+    if _template is None or len(_template) != num_perm:
+        _template = MinHash(num_perm=num_perm)
+    return _template
+
+
+def hash_tokens(tokens, num_perm=NUM_PERM):
+    """Permuted hash vector of each token on its own, exactly as datasketch computes it."""
+    m = template(num_perm).copy()
+    out = np.empty((len(tokens), num_perm), dtype=m.hashvalues.dtype)
+    for i, token in enumerate(tokens):
+        m.clear()
+        m.update(token.encode('utf8'))
+        out[i] = m.hashvalues
+    return out
+
+
+def token_table(vocab, num_perm=NUM_PERM, workers=None):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(vocab) < PARALLEL_MIN_TOKENS:
+        return hash_tokens(vocab, num_perm)
+
+    chunks = [vocab[i:i + TOKEN_CHUNK] for i in range(0, len(vocab), TOKEN_CHUNK)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers) as pool:
+        parts = pool.starmap(hash_tokens, [(chunk, num_perm) for chunk in chunks])
+    return np.concatenate(parts)
+
+
+def minhash_signatures(token_sets, num_perm=NUM_PERM, workers=None):
+    """Signature matrix (n_docs x num_perm) for many token sets at once.
+
+    Each distinct token is hashed once; a document's signature is the element-wise
+    minimum of its tokens' rows, taken with np.minimum.reduceat over the flattened
+    token ids. The result matches MinHash.update called per token.
+    """
+    vocab = {}
+    flat_ids = []
+    lengths = np.empty(len(token_sets), dtype=np.int64)
+    for d, tokens in enumerate(token_sets):
+        lengths[d] = len(tokens)
+        for t in tokens:
+            flat_ids.append(vocab.setdefault(t, len(vocab)))
+    flat_ids = np.asarray(flat_ids, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    table = token_table(list(vocab), num_perm, workers)
+    empty = template(num_perm).hashvalues
+    signatures = np.tile(empty, (len(token_sets), 1))
+
+    # Process documents in blocks so table[flat_ids] stays bounded in memory
+    start = 0
+    while start < len(token_sets):
+        end = int(np.searchsorted(offsets, offsets[start] + DOC_BLOCK_TOKENS, side='right')) - 1
+        end = min(max(end, start + 1), len(token_sets))
+        docs = np.arange(start, end)
+        docs = docs[lengths[docs] > 0]
+        if len(docs):
+            block = table[flat_ids[offsets[start]:offsets[end]]]
+            signatures[docs] = np.minimum.reduceat(block, offsets[docs] - offsets[start], axis=0)
+        start = end
+    return signatures
+
+
+def build_lsh(signatures, keys, threshold=THRESHOLD):
+    lsh = MinHashLSH(threshold=threshold, num_perm=signatures.shape[1])
+    # LSH only reads hashvalues during the call, so one MinHash is reused as a carrier
+    probe = template(signatures.shape[1]).copy()
+    with lsh.insertion_session() as session:
+        for key in keys:
+            probe.hashvalues = signatures[key]
+            session.insert(key, probe)
+    return lsh
+
+
+def query_lsh(lsh, signatures, i, probe=None):
+    probe = probe or template(signatures.shape[1]).copy()
+    probe.hashvalues = signatures[i]
+    return [k for k in lsh.query(probe) if k != i]
+
+
+def jaccard_many(signatures, i, others):
+    return (signatures[others] == signatures[i]).mean(axis=1)
+
+
+def lsh_neighbours(signatures, threshold=THRESHOLD):
+    """LSH candidates between distinct signatures.
+
+    Returns (first, inverse, counts, neighbours): first[u] is the row holding distinct
+    signature u, inverse maps each row to u, counts[u] is how many rows share it, and
+    neighbours[u] lists the other distinct signatures sharing a bucket with u.
+    """
+    _, first, inverse, counts = np.unique(signatures, axis=0, return_index=True,
+                                          return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    group_of = {int(row): u for u, row in enumerate(first)}
+    lsh = build_lsh(signatures, first.tolist(), threshold)
+    probe = template(signatures.shape[1]).copy()
+    neighbours = [[group_of[k] for k in query_lsh(lsh, signatures, int(row), probe)] for row in first]
+    return first, inverse, counts, neighbours
+
+
+def label_duplicates(signatures, threshold=THRESHOLD):
+    """Label each row unique / exact_duplicate / near_duplicate from its LSH candidates.
+
+    Rows sharing a signature with another row are exact duplicates; the LSH index holds
+    one row per distinct signature, so any remaining candidate has Jaccard below 1.0.
+    """
+    first, inverse, counts, neighbours = lsh_neighbours(signatures, threshold)
+    group_labels = []
+    for u in range(len(first)):
+        if counts[u] > 1:
+            group_labels.append('exact_duplicate')
+        elif neighbours[u]:
+            group_labels.append('near_duplicate')
+        else:
+            group_labels.append('unique')
+    return [group_labels[u] for u in inverse]
@@ -0,0 +1,130 @@
+import os
+import multiprocessing
+from contextlib import contextmanager
+import numpy as np
+from tqdm import tqdm
+from app.encoder import load_model
+
+TOKEN_BUDGET = 8192
+MAX_BATCH_SIZE = 256
+PARALLEL_MIN_ROWS = 5_000
+
+worker_model = None
+# Pool shared by the parallel_encode calls inside reuse_pool(): ((backend, workers), pool)
+_pool = None
+_reuse_depth = 0
+
+
+def default_workers():
+    return int(os.getenv("TREX_EMBED_WORKERS", os.cpu_count() or 1))
+
+
+def token_lengths(texts, tokenizer=None, max_length=256):
+    if tokenizer is None:
+        # Rough proxy when no tokenizer is at hand: wordpieces run ~1.3 per whitespace word
+        return np.array([int(len(t.split()) * 1.3) + 2 for t in texts], dtype=np.int64)
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def length_buckets(lengths, token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE):
+    """Group row indices into batches of similar length whose padded size stays under token_budget."""
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    current = []
+    for idx in order:
+        # Sorted ascending, so the incoming row sets the padded length of the whole batch
+        padded = (len(current) + 1) * max(int(lengths[idx]), 1)
+        if current and (padded > token_budget or len(current) >= max_batch_size):
+            batches.append(np.array(current))
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(np.array(current))
+    return batches
+
+
+def init_worker(backend):
+    global worker_model
+    import torch
+    worker_model = load_model(backend, verbose=False)
+    # One model per core: intra-op threading would oversubscribe the pool
+    torch.set_num_threads(1)
+
+
+def encode_batch(job):
+    indices, texts = job
+    vectors = worker_model.encode(
+        texts,
+        batch_size=len(texts),
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    return indices, vectors
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool[1].terminate()
+        _pool[1].join()
+        _pool = None
+
+
+def get_pool(backend, workers):
+    """The shared worker pool for this backend and size, started (and its models loaded) on first use."""
+    global _pool
+    if _pool is None or _pool[0] != (backend, workers):
+        close_pool()
+        # spawn keeps torch/CUDA state out of the children
+        ctx = multiprocessing.get_context("spawn")
+        _pool = ((backend, workers), ctx.Pool(workers, initializer=init_worker, initargs=(backend,)))
+    return _pool[1]
+
+
+@contextmanager
+def reuse_pool():
+    """Keep one worker pool, with its loaded models, across every parallel_encode call in the block.
+
+    Without it each call starts its own pool, which is fine for a single call but not once per
+    streamed chunk. The pool is shut down when the outermost block exits.
+    """
+    global _reuse_depth
+    _reuse_depth += 1
+    try:
+        yield
+    finally:
+        _reuse_depth -= 1
+        if _reuse_depth == 0:
+            close_pool()
+
+
+def parallel_encode(texts, backend='cpu-int8', workers=None, tokenizer=None, max_length=256,
+                    token_budget=TOKEN_BUDGET):
+    """Encode texts on a pool of single-threaded CPU workers, batching by token budget."""
+    workers = workers or default_workers()
+    lengths = token_lengths(texts, tokenizer, max_length)
+    batches = length_buckets(lengths, token_budget)
+    # Longest batches first so no worker is left with a big one at the end
+    batches.sort(key=lambda b: -int(lengths[b].max()) * len(b))
+    jobs = [(b, [texts[i] for i in b]) for b in batches]
+    print(f"[+] Encoding {len(texts)} texts in {len(batches)} length-bucketed batches on {workers} workers")
+
+    embeddings = None
+    pool = get_pool(backend, workers)
+    try:
+        with tqdm(total=len(texts), desc="Batches") as progress:
+            for indices, vectors in pool.imap_unordered(encode_batch, jobs):
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                embeddings[indices] = vectors
+                progress.update(len(indices))
+    except BaseException:
+        # A failed run may leave jobs queued in the pool, so it is not reused
+        close_pool()
+        raise
+    if not _reuse_depth:
+        close_pool()
+
+    return embeddings
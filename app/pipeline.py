@@ -3,17 +3,18 @@ import os
 import seaborn as sns
 import plotly.express as px
 import pandas as pd
-import re
-import emoji
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from app.registry import get_stopwords
+from app.features import ensure_text_features
+from app.interaction import show, confirm
 
 ALLOWED_OBJECT_TYPES = ['object', 'category', 'bool']
 ALLOWED_NUMERIC_TYPES = ['int64', 'float64']
 
 
-def metadata_viz(df, text_col, columns):
+def metadata_viz(df, text_col, columns, interactive=True):
     os.makedirs("results/eda", exist_ok=True)
+    sw_set = get_stopwords()
+    ensure_text_features(df, text_col, sw_set)
 
     # 1. Distribution Plot
     fig, axes = plt.subplots(len(columns), 1, figsize=(8, 5 * len(columns)))
@@ -32,10 +33,9 @@ def metadata_viz(df, text_col, columns):
         ax.set_ylabel("Frequency")
 
     plt.tight_layout()
-    plt.show()
+    show(interactive)
 
-    save = input("Save this distribution plot? (y/n): ").strip().lower()
-    if save == 'y':
+    if confirm("Save this distribution plot? (y/n): ", interactive):
         plt.savefig("results/eda/metadata_distributions.png")
         print("[+] Saved metadata_distributions.png")
 
@@ -48,10 +48,9 @@ def metadata_viz(df, text_col, columns):
         sns.heatmap(corr_matrix, annot=True, cmap='coolwarm')
         plt.title("Correlation Heatmap")
         plt.tight_layout()
-        plt.show()
+        show(interactive)
 
-        save = input("Save correlation heatmap? (y/n): ").strip().lower()
-        if save == 'y':
+        if confirm("Save correlation heatmap? (y/n): ", interactive):
             plt.savefig("results/eda/correlation_heatmap.png")
             print("[+] Saved correlation_heatmap.png")
 
@@ -67,10 +66,9 @@ def metadata_viz(df, text_col, columns):
         render_mode='webgl'
     )
     fig.update_layout(margin=dict(l=40, r=40, t=40, b=40))
-    fig.show()
+    show(interactive, fig)
 
-    save = input("Save this interactive plot (HTML)? (y/n): ").strip().lower()
-    if save == 'y':
+    if confirm("Save this interactive plot (HTML)? (y/n): ", interactive):
         fig.write_html("results/eda/text_word_char_distribution.html")
         print("[+] Saved text_word_char_distribution.html")
 
@@ -87,15 +85,13 @@ def metadata_viz(df, text_col, columns):
         color_discrete_map={True: 'red', False: 'blue'}
     )
     fig.update_layout(margin=dict(l=40, r=40, t=40, b=40))
-    fig.show()
+    show(interactive, fig)
 
-    save = input("Save outlier plot (HTML)? (y/n): ").strip().lower()
-    if save == 'y':
+    if confirm("Save outlier plot (HTML)? (y/n): ", interactive):
         fig.write_html("results/eda/embedding_vs_charcount_outliers.html")
         print("[+] Saved embedding_vs_charcount_outliers.html")
 
     # 5. Stopword, Junk, Emoji analysis per valid categorical metadata column
-    sw_set = set(stopwords.words('english'))
     for col in columns:
         if df[col].dtype.name not in ALLOWED_OBJECT_TYPES or df[col].nunique() > 50:
             print(f"[!] Skipping token category plot for {col} due to high cardinality or unsupported dtype.")
@@ -103,44 +99,35 @@ def metadata_viz(df, text_col, columns):
 
         grouped = df.groupby(col)
         for group_val, sub_df in grouped:
-            stopword_counts, junk_counts, emoji_counts, other_counts = [], [], [], []
-            for text in sub_df[text_col].astype(str):
-                tokens = word_tokenize(text)
-                stop_ct = sum(1 for t in tokens if t.lower() in sw_set)
-                emoji_ct = sum(1 for c in text if emoji.is_emoji(c))
-                junk_ct = len(re.findall(r"[^\w\s]", text)) - emoji_ct
-                total = len(tokens)
-                stopword_counts.append(stop_ct)
-                junk_counts.append(junk_ct)
-                emoji_counts.append(emoji_ct)
-                other_counts.append(max(total - stop_ct - junk_ct - emoji_ct, 0))
+            category_counts = [sub_df['stopword_count'], sub_df['junk_count'], sub_df['emoji_count'], sub_df['other_count']]
 
             plt.figure(figsize=(10, 6))
-            plt.hist([stopword_counts, junk_counts, emoji_counts, other_counts], bins=30, label=['Stopwords', 'Junk', 'Emoji', 'Other'])
+            plt.hist(category_counts, bins=30, label=['Stopwords', 'Junk', 'Emoji', 'Other'])
             plt.title(f"Token Category Distribution for {col} = {group_val}")
             plt.xlabel("Count")
             plt.ylabel("Number of Rows")
             plt.legend()
             plt.tight_layout()
-            plt.show()
+            show(interactive)
 
-            save = input(f"Save token category plot for {col}={group_val}? (y/n): ").strip().lower()
-            if save == 'y':
+            if confirm(f"Save token category plot for {col}={group_val}? (y/n): ", interactive):
                 fname = f"results/eda/token_categories_{col}_{str(group_val).replace(' ', '_')}.png"
                 plt.savefig(fname)
                 print(f"[+] Saved {fname}")
 
     # 6. Token count distribution
-    token_lens = df[text_col].astype(str).apply(lambda x: len(word_tokenize(x)))
+    token_lens = df['token_count']
     plt.figure(figsize=(8,6))
     sns.histplot(token_lens, bins=40)
     plt.title("Token Count Distribution")
     plt.xlabel("Tokens per Text")
     plt.ylabel("Frequency")
     plt.tight_layout()
-    plt.show()
+    show(interactive)
 
-    save = input("Save token count histogram? (y/n): ").strip().lower()
-    if save == 'y':
+    if confirm("Save token count histogram? (y/n): ", interactive):
         plt.savefig("results/eda/token_count_distribution.png")
         print("[+] Saved token_count_distribution.png")
+
+    if not interactive:
+        plt.close('all')
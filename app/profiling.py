@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_DIR = "results/traces"
+SAMPLE_INTERVAL = 0.005
+TOP_FRAMES = 30
+
+_active = None
+
+
+def rss_mb():
+    """Current resident set size in MB, where the platform exposes it cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def children_cpu():
+    # CPU of finished worker processes (spawn pools), which process_time() does not include
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+def peak_rss_mb():
+    """Process high-water mark of resident memory in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class Sampler(threading.Thread):
+    """Statistical profiler: samples the traced thread's stack every interval via sys._current_frames."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = f"{code.co_name} ({os.path.relpath(code.co_filename)}:{code.co_firstlineno})"
+                if leaf:
+                    self.self_counts[key] += 1
+                    leaf = False
+                if key not in seen:
+                    self.total_counts[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        share = lambda n: round(n / self.samples, 4) if self.samples else 0.0
+        return {
+            "interval_s": self.interval,
+            "samples": self.samples,
+            "self": [{"frame": k, "share": share(n)} for k, n in self.self_counts.most_common(TOP_FRAMES)],
+            "cumulative": [{"frame": k, "share": share(n)} for k, n in self.total_counts.most_common(TOP_FRAMES)],
+        }
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.spans = []
+        self.stack = []
+
+    def to_dict(self, wall_s, profile=None):
+        trace = {
+            "name": self.name,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": round(wall_s, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "spans": self.spans,
+        }
+        if profile is not None:
+            trace["profile"] = profile
+        return trace
+
+
+@contextmanager
+def trace(name, sample=None, trace_dir=TRACE_DIR):
+    """Collect every span opened inside the block and write them as one JSON trace.
+
+    sample=True (or TREX_PROFILE=1) also runs the sampling profiler on the calling thread.
+    Nested calls join the enclosing trace instead of starting a new one.
+    """
+    global _active
+    if _active is not None:
+        with span(name):
+            yield _active
+        return
+
+    sample = os.getenv("TREX_PROFILE") == "1" if sample is None else sample
+    _active = Trace(name)
+    sampler = Sampler(threading.get_ident()) if sample else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield _active
+    finally:
+        wall = time.perf_counter() - start
+        profile = sampler.stop() if sampler else None
+        result, _active = _active, None
+        os.makedirs(trace_dir, exist_ok=True)
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        path = os.path.join(trace_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}.json")
+        with open(path, "w") as f:
+            json.dump(result.to_dict(wall, profile), f, indent=2)
+        print(f"[+] Trace written to {path}")
+
+
+@contextmanager
+def span(name, rows=None, **attrs):
+    """Time a (sub-)stage: wall and CPU seconds, memory, and rows/sec when rows is known.
+
+    Yields the span record, so rows can also be set once known: `s["rows"] = n`.
+    Outside an active trace this only costs a few clock reads.
+    """
+    current = _active
+    record = {"name": name, "rows": rows, **attrs}
+    if current is not None:
+        record["parent"] = current.stack[-1]["name"] if current.stack else None
+        record["depth"] = len(current.stack)
+        current.stack.append(record)
+    rss0 = rss_mb() if current is not None else None
+    wall0, cpu0, children0 = time.perf_counter(), time.process_time(), children_cpu()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - wall0
+        if current is not None:
+            rss1 = rss_mb()
+            record.update({
+                "wall_s": round(wall, 6),
+                "cpu_s": round(time.process_time() - cpu0, 6),
+                "child_cpu_s": round(children_cpu() - children0, 6),
+                "rss_mb": round(rss1, 1) if rss1 is not None else None,
+                "rss_delta_mb": round(rss1 - rss0, 1) if rss1 is not None and rss0 is not None else None,
+                "peak_rss_mb": peak_rss_mb(),
+                "rows_per_sec": round(record["rows"] / wall, 1) if record.get("rows") and wall > 0 else None,
+            })
+            current.stack.pop()
+            current.spans.append(record)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+# Process-wide, lazily created resources. Each factory runs at most once, on first use.
+_lock = threading.RLock()
+_factories = {}
+_resources = {}
+load_times = {}
+
+
+def register(name, factory):
+    with _lock:
+        _factories[name] = factory
+
+
+def get(name):
+    with _lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = _factories[name]()
+            load_times[name] = time.perf_counter() - start
+        return _resources[name]
+
+
+def replace(name, resource):
+    with _lock:
+        _resources[name] = resource
+
+
+def is_loaded(name):
+    return name in _resources
+
+
+def warmup(names=None, background=True):
+    """Load resources ahead of first use, optionally on a daemon thread."""
+    names = names or list(_factories)
+
+    def load_all():
+        for name in names:
+            try:
+                get(name)
+            except Exception as e:
+                print(f"[!] Background warmup of {name} failed: {e}")
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name="trex-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _load_model():
+    from app.encoder import load_model
+    return load_model()
+
+
+def _load_stopwords():
+    from nltk.corpus import stopwords
+    return set(stopwords.words("english"))
+
+
+register("model", _load_model)
+register("stopwords", _load_stopwords)
+
+
+def get_model():
+    return get("model")
+
+
+def get_stopwords():
+    return get("stopwords")
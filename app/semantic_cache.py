@@ -0,0 +1,96 @@
+import hashlib
+import io
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+CACHE_PATH = "data/question_cache.db"
+QUESTION_CACHE_THRESHOLD = 0.92
+MAX_RESULT_ROWS = 1_000
+
+
+def cache_scope(fingerprint, model_name, context_cols, pii_mask):
+    """Answers are only reusable for the same data, embedding model and retrieval context."""
+    raw = repr((fingerprint, model_name, list(context_cols), bool(pii_mask)))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class QuestionCache:
+    """Answered Text2SQL questions, looked up by embedding similarity instead of exact wording.
+
+    Entries are tied to the data fingerprint of the session store; opening the cache for
+    changed data drops every entry recorded for other data.
+    """
+
+    def __init__(self, fingerprint, scope, path=CACHE_PATH, threshold=QUESTION_CACHE_THRESHOLD):
+        self.fingerprint = fingerprint
+        self.scope = scope
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, scope TEXT NOT NULL, question TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, sql TEXT NOT NULL, result TEXT, created REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_scope ON questions(scope)")
+        stale = self.conn.execute("DELETE FROM questions WHERE fingerprint != ?", (fingerprint,)).rowcount
+        self.conn.commit()
+        if stale:
+            print(f"[+] Data changed: dropped {stale} cached Text2SQL answers")
+
+        rows = self.conn.execute(
+            "SELECT id, embedding FROM questions WHERE scope = ? ORDER BY id", (scope,)
+        ).fetchall()
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.embeddings = (np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                           if rows else np.empty((0, 0), dtype=np.float32))
+
+    @staticmethod
+    def normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding):
+        """Closest answered question at or above the threshold as a dict, else None."""
+        if len(self.ids) == 0:
+            self.misses += 1
+            return None
+        sims = self.embeddings @ self.normalize(embedding)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        question, sql, result = self.conn.execute(
+            "SELECT question, sql, result FROM questions WHERE id = ?", (int(self.ids[best]),)
+        ).fetchone()
+        self.hits += 1
+        return {
+            "question": question,
+            "sql": sql,
+            "result": pd.read_json(io.StringIO(result), orient="split") if result else None,
+            "similarity": float(sims[best]),
+        }
+
+    def add(self, question, embedding, sql, result=None):
+        vector = self.normalize(embedding)
+        payload = result.head(MAX_RESULT_ROWS).to_json(orient="split", index=False) if result is not None else None
+        cur = self.conn.execute(
+            "INSERT INTO questions (fingerprint, scope, question, embedding, sql, result, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.fingerprint, self.scope, question, vector.tobytes(), sql, payload, time.time())
+        )
+        self.conn.commit()
+        self.ids = np.append(self.ids, cur.lastrowid)
+        self.embeddings = np.vstack([self.embeddings, vector]) if self.embeddings.size else vector[None, :]
+
+    def close(self):
+        self.conn.close()
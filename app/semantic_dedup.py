@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import pandas as pd
+from app.dedup_groups import UnionFind
+from app.vector_index import load_or_build_index
+from app.embedding_store import open_store
+from app.profiling import span
+
+EMBEDDING_PATH = "data/initial_embeddings.npy"
+PAIRS_PATH = "results/dedup/semantic_pairs.csv"
+SEMANTIC_THRESHOLD = 0.95
+MAX_MEMORY_MB = 512
+EXACT_MAX_ROWS = 200_000
+CANDIDATE_NPROBE = 4
+
+
+def block_rows(dim, max_memory_mb):
+    """Rows per block so one block's working set fits the budget: the b x b float32 similarities
+    and their b x b bool mask, plus two float32 row blocks of b x dim with the same again for the
+    copies made while loading and dequantizing them. Pairs found are output, not counted here."""
+    budget = max_memory_mb * 1024 * 1024
+    b = (-16 * dim + np.sqrt(256 * dim * dim + 20 * budget)) / 10
+    return max(1, int(b))
+
+
+def block_pairs(a, b, a_ids, b_ids, threshold, same_block=False):
+    sims = a @ b.T
+    rows, cols = np.nonzero(sims >= threshold)
+    if same_block:
+        # Each pair once and no self-pairs, whatever the threshold
+        keep = rows < cols
+        rows, cols = rows[keep], cols[keep]
+    return a_ids[rows], b_ids[cols], sims[rows, cols]
+
+
+def exact_pairs(embeddings, threshold, max_memory_mb):
+    """All pairs above threshold by blocked matrix multiplication over the memory-mapped matrix."""
+    n, dim = embeddings.shape
+    step = block_rows(dim, max_memory_mb)
+    for i in range(0, n, step):
+        a = np.asarray(embeddings[i:i + step], dtype=np.float32)
+        a_ids = np.arange(i, i + len(a))
+        for j in range(i, n, step):
+            b = a if j == i else np.asarray(embeddings[j:j + step], dtype=np.float32)
+            yield block_pairs(a, b, a_ids, np.arange(j, j + len(b)), threshold, same_block=(i == j))
+
+
+def candidate_pairs(embeddings, threshold, max_memory_mb, nprobe=CANDIDATE_NPROBE, embedding_path=EMBEDDING_PATH):
+    """Pairs above threshold among rows whose IVF lists are near each other; misses pairs split across far lists."""
+    index = load_or_build_index(embedding_path)
+    dim = embeddings.shape[1]
+    step = block_rows(dim, max_memory_mb)
+    neighbour_lists = np.argsort(-(index.centroids @ index.centroids.T), axis=1)[:, :nprobe]
+
+    def members(l):
+        return index.ids[index.offsets[l]:index.offsets[l + 1]]
+
+    for l in range(index.n_lists):
+        own = np.sort(members(l))
+        if len(own) == 0:
+            continue
+        others = np.sort(np.concatenate([members(m) for m in neighbour_lists[l]]))
+        for i in range(0, len(own), step):
+            a_ids = own[i:i + step]
+            a = np.asarray(embeddings[a_ids], dtype=np.float32)
+            # Only keep pairs with a_id < b_id so each pair is reported once per list visit
+            for j in range(0, len(others), step):
+                b_ids = others[j:j + step]
+                b_ids = b_ids[b_ids > a_ids[0]]
+                if len(b_ids) == 0:
+                    continue
+                left, right, sims = block_pairs(a, np.asarray(embeddings[b_ids], dtype=np.float32),
+                                                a_ids, b_ids, threshold)
+                keep = left < right
+                yield left[keep], right[keep], sims[keep]
+
+
+def semantic_pairs(embedding_path=EMBEDDING_PATH, threshold=SEMANTIC_THRESHOLD, max_memory_mb=MAX_MEMORY_MB,
+                   method=None):
+    """Row-position pairs with cosine similarity >= threshold; never materializes the n x n matrix."""
+    embeddings = open_store(embedding_path)
+    method = method or ("exact" if len(embeddings) <= EXACT_MAX_ROWS else "ivf")
+    # int8 scores are approximate, so scan with a margin and rescore the survivors
+    scan_threshold = threshold - embeddings.margin
+    if method == "exact":
+        blocks = exact_pairs(embeddings, scan_threshold, max_memory_mb)
+    else:
+        blocks = candidate_pairs(embeddings, scan_threshold, max_memory_mb, embedding_path=embedding_path)
+
+    left, right, sims = [], [], []
+    for a, b, s in blocks:
+        left.append(a)
+        right.append(b)
+        sims.append(s)
+    if not left:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    left, right, sims = np.concatenate(left), np.concatenate(right), np.concatenate(sims)
+    if method != "exact":
+        # Neighbouring lists overlap, so the same pair can surface more than once
+        _, keep = np.unique(left * len(embeddings) + right, return_index=True)
+        left, right, sims = left[keep], right[keep], sims[keep]
+    if embeddings.lossy:
+        sims = embeddings.pair_scores(left, right)
+        keep = sims >= threshold
+        left, right, sims = left[keep], right[keep], sims[keep]
+    return left, right, sims
+
+
+def semantic_dedup(df, threshold=SEMANTIC_THRESHOLD, max_memory_mb=MAX_MEMORY_MB, embedding_path=EMBEDDING_PATH,
+                   method=None):
+    """Tag paraphrase duplicates in df (rows aligned with the embedding matrix) and save the pairs."""
+    with span("semantic_pairs", rows=len(df)):
+        left, right, sims = semantic_pairs(embedding_path, threshold, max_memory_mb, method)
+
+    uf = UnionFind(len(df))
+    for a, b in zip(left.tolist(), right.tolist()):
+        uf.union(a, b)
+    roots = uf.roots()
+    _, group_ids = np.unique(roots, return_inverse=True)
+
+    row_ids = df['row_id'].to_numpy()
+    df['semantic_group_id'] = group_ids
+    df['semantic_canonical_id'] = row_ids[roots]
+    df['semantic_duplicate'] = np.bincount(group_ids)[group_ids] > 1
+
+    os.makedirs(os.path.dirname(PAIRS_PATH), exist_ok=True)
+    pairs = pd.DataFrame({'row_id_a': row_ids[left], 'row_id_b': row_ids[right], 'similarity': sims})
+    pairs.sort_values('similarity', ascending=False).to_csv(PAIRS_PATH, index=False)
+    return pairs
@@ -0,0 +1,86 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SESSION_DIR = "data/session"
+
+
+def table_path(name, session_dir=SESSION_DIR):
+    return os.path.join(session_dir, f"{name}.parquet")
+
+
+def table_exists(name, session_dir=SESSION_DIR):
+    return os.path.exists(table_path(name, session_dir))
+
+
+def arrow_safe(df):
+    """df with object columns that mix value types (e.g. ids that are ints in some rows and strings in
+    others) turned into strings, missing values kept, since Arrow needs one type per column."""
+    from pandas.api.types import infer_dtype
+    mixed = {col: df[col] for col in df.columns
+             if df[col].dtype == object and infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer")}
+    if not mixed:
+        return df
+    return df.assign(**{col: values.where(values.isna(), values.astype(str)) for col, values in mixed.items()})
+
+
+def save_table(df, name, session_dir=SESSION_DIR):
+    """Write a session table as Parquet (dtypes, including categoricals, survive the round trip)."""
+    os.makedirs(session_dir, exist_ok=True)
+    path = table_path(name, session_dir)
+    tmp_path = path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(arrow_safe(df), preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_arrow(path, columns=None):
+    # Projection happens in the reader, so unrequested columns are never read or decompressed
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in dict.fromkeys(columns) if c in available]
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def load_table(name, columns=None, session_dir=SESSION_DIR):
+    """Load a session table, reading only the requested columns that exist (all by default)."""
+    path = table_path(name, session_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No session table '{name}' at {path}. Load the file from start.")
+    return read_arrow(path, columns).to_pandas()
+
+
+def table_columns(name, session_dir=SESSION_DIR):
+    """Column names of a session table, read from the Parquet footer alone."""
+    return pq.read_schema(table_path(name, session_dir)).names
+
+
+def unify_part_schemas(schemas):
+    """One schema for all parts. Chunks can infer different types for the same column (all-null in one,
+    ints in one and strings in another); columns whose types cannot be promoted become strings."""
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    fields = []
+    for name in schemas[0].names:
+        try:
+            fields.append(pa.unify_schemas([pa.schema([s.field(name)]) for s in schemas],
+                                           promote_options="permissive").field(name))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields.append(pa.field(name, pa.large_string()))
+    # The pandas metadata describes the first part's dtypes, which no longer hold for the fallbacks
+    return pa.schema(fields)
+
+
+def combine_parts(part_paths, name, session_dir=SESSION_DIR):
+    """Concatenate Parquet part files into one session table, one part in memory at a time."""
+    os.makedirs(session_dir, exist_ok=True)
+    path = table_path(name, session_dir)
+    tmp_path = path + ".tmp"
+    schema = unify_part_schemas([pq.read_schema(p) for p in part_paths])
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for part in part_paths:
+            writer.write_table(pq.read_table(part).cast(schema))
+    os.replace(tmp_path, path)
+    return path
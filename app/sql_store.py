@@ -0,0 +1,119 @@
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+import pandas as pd
+from app.embedding import STATS_COLUMNS
+from app.profiling import span
+
+DB_PATH = "data/trex_session.db"
+TABLE = "df"
+FTS_TABLE = "df_fts"
+INSERT_CHUNK_ROWS = 50_000
+
+_session_store = None
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def frame_fingerprint(df, text_col):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((list(map(str, df.columns)), [str(t) for t in df.dtypes], text_col)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class SQLStore:
+    """On-disk SQLite copy of the session data, built once and reused across Text2SQL questions.
+
+    Only the build writes to the file. Queries go through a read-only connection, so a generated or
+    pasted DELETE / DROP / UPDATE fails instead of corrupting a store whose fingerprint still matches.
+    """
+
+    def __init__(self, df, text_col, path=DB_PATH, fingerprint=None):
+        self.text_col = text_col
+        self.path = path
+        self.fingerprint = fingerprint or frame_fingerprint(df, text_col)
+        self.has_fts = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS trex_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        row = self.conn.execute("SELECT value FROM trex_meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != self.fingerprint:
+            with span("sql_store_build", rows=len(df)):
+                self.build(df)
+        else:
+            print(f"[+] Reusing SQLite store at {path}")
+        self.conn.close()
+
+        self.conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.execute("PRAGMA query_only=ON")
+        self.has_fts = self.table_exists(FTS_TABLE)
+
+    def table_exists(self, name):
+        row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def build(self, df):
+        start = time.time()
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        df.to_sql(TABLE, self.conn, index=False, if_exists="replace", chunksize=INSERT_CHUNK_ROWS)
+
+        # Derived embedding stats are rarely filtered on, so only user metadata gets an index
+        for col in df.columns:
+            if col == self.text_col or col in STATS_COLUMNS:
+                continue
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {quote('idx_' + str(col))} ON {TABLE} ({quote(col)})")
+
+        # External-content FTS5 table: indexes the text column without storing a second copy of it
+        try:
+            self.conn.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({quote(self.text_col)}, "
+                f"content='{TABLE}', content_rowid='rowid')"
+            )
+            self.conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+        except sqlite3.OperationalError as e:
+            print(f"[!] FTS5 unavailable in this SQLite build, skipping full-text index: {e}")
+
+        self.conn.execute("ANALYZE")
+        self.conn.execute("INSERT OR REPLACE INTO trex_meta (key, value) VALUES ('fingerprint', ?)", (self.fingerprint,))
+        self.conn.commit()
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        print(f"[+] Built SQLite store with {len(df)} rows in {time.time() - start:.2f} seconds")
+
+    def query(self, sql, params=None):
+        with span("sql_query") as s:
+            result = pd.read_sql_query(sql, self.conn, params=params)
+            s["rows"] = len(result)
+        return result
+
+    def search_text(self, terms, limit=20):
+        if not self.has_fts:
+            raise RuntimeError("Full-text index is not available.")
+        return self.query(
+            f"SELECT {TABLE}.* FROM {FTS_TABLE} JOIN {TABLE} ON {TABLE}.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ? ORDER BY rank LIMIT ?",
+            params=(terms, int(limit))
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def get_store(df, text_col, path=DB_PATH):
+    """Return the session's store, rebuilding only when the data or text column changed."""
+    global _session_store
+    fingerprint = frame_fingerprint(df, text_col)
+    if _session_store is not None:
+        if _session_store.path == path and _session_store.fingerprint == fingerprint:
+            return _session_store
+        _session_store.close()
+    _session_store = SQLStore(df, text_col, path, fingerprint)
+    return _session_store
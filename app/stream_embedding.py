@@ -0,0 +1,189 @@
+import glob
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from app import embedding
+from app.embedding_cache import EmbeddingCache, cached_encode
+from app.registry import get_model
+from app.session_store import SESSION_DIR, arrow_safe, combine_parts
+from app.embedding_store import compact_store, open_store
+from app.parallel_embedding import reuse_pool
+
+EMBEDDING_PATH = "data/initial_embeddings.npy"
+PARTS_DIR = os.path.join(SESSION_DIR, "parts")
+CHECKPOINT_PATH = "data/embedding_checkpoint.json"
+
+
+def source_fingerprint(csv_path, text_col, columns, model_name):
+    stat = os.stat(csv_path)
+    return {
+        "source": os.path.abspath(csv_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "text_col": text_col,
+        "columns": columns,
+        "model": model_name,
+        "layout": "parquet-parts",
+    }
+
+
+def load_checkpoint(fingerprint):
+    if not os.path.exists(CHECKPOINT_PATH) or not os.path.exists(EMBEDDING_PATH):
+        return None
+    with open(CHECKPOINT_PATH) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("fingerprint") != fingerprint:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint):
+    # Write-then-rename so a crash never leaves a half-written checkpoint behind
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def count_rows(csv_path, text_col, chunksize, read_kwargs):
+    total = 0
+    for chunk in pd.read_csv(csv_path, usecols=[text_col], chunksize=chunksize, **read_kwargs):
+        total += len(chunk)
+    return total
+
+
+def part_path(table, index):
+    return os.path.join(PARTS_DIR, f"{table}-{index:06d}.parquet")
+
+
+def drop_parts_from(index):
+    # Parts written after the last checkpoint would otherwise be duplicated on resume
+    for path in glob.glob(os.path.join(PARTS_DIR, "*.parquet")):
+        if int(os.path.basename(path).rsplit("-", 1)[1].split(".")[0]) >= index:
+            os.remove(path)
+
+
+def resume_kwargs(csv_path, rows_done, read_kwargs):
+    """read_csv arguments that start after rows_done data rows.
+
+    An integer skiprows skips lines without building a set of row numbers (a range of ~20M rows
+    would), but it also skips the header, so the column names are read first and passed in.
+    """
+    header = read_kwargs.get("header", "infer")
+    if header is None or (header == "infer" and read_kwargs.get("names") is not None):
+        return {**read_kwargs, "skiprows": rows_done}
+    names = pd.read_csv(csv_path, nrows=0, **read_kwargs).columns.tolist()
+    header_lines = 1 if header == "infer" else header + 1
+    return {**read_kwargs, "header": None, "names": names, "skiprows": header_lines + rows_done}
+
+
+def stream_embeddings(csv_path, text_col, columns=None, chunksize=10_000, use_cache=True, **read_kwargs):
+    """Embed a CSV chunk by chunk into a memory-mapped .npy, resuming from the last checkpoint.
+
+    A resume skips already embedded rows as physical lines, so quoted fields that span several
+    lines before the checkpoint misalign the resume offset; such files should be restarted.
+    """
+    start_time = time.time()
+    columns = columns or []
+    usecols = [text_col] + [c for c in columns if c != text_col]
+    fingerprint = source_fingerprint(csv_path, text_col, usecols, get_model().trex_cache_name)
+
+    os.makedirs("data", exist_ok=True)
+    checkpoint = load_checkpoint(fingerprint)
+
+    if checkpoint is None:
+        total_rows = count_rows(csv_path, text_col, chunksize, read_kwargs)
+        dim = get_model().get_sentence_embedding_dimension()
+        vectors = np.lib.format.open_memmap(EMBEDDING_PATH, mode="w+", dtype=np.float32, shape=(total_rows, dim))
+        shutil.rmtree(PARTS_DIR, ignore_errors=True)
+        checkpoint = {
+            "fingerprint": fingerprint,
+            "total_rows": total_rows,
+            "rows_done": 0,
+            "parts": 0,
+            "complete": False,
+        }
+        save_checkpoint(checkpoint)
+        print(f"[+] Streaming {total_rows} rows into {EMBEDDING_PATH}")
+    else:
+        vectors = np.lib.format.open_memmap(EMBEDDING_PATH, mode="r+")
+        if checkpoint["complete"]:
+            print(f"[+] Embeddings for {csv_path} are already complete.")
+            return open_store(EMBEDDING_PATH), time.time() - start_time
+        # Drop parts written after the last checkpoint so the side tables line up with the vectors
+        drop_parts_from(checkpoint["parts"])
+        print(f"[+] Resuming at row {checkpoint['rows_done']} of {checkpoint['total_rows']}")
+
+    rows_done = checkpoint["rows_done"]
+    if rows_done:
+        read_kwargs = resume_kwargs(csv_path, rows_done, read_kwargs)
+
+    os.makedirs(PARTS_DIR, exist_ok=True)
+    cache = EmbeddingCache(get_model().trex_cache_name) if use_cache else None
+    try:
+        # Encoder workers and their models are started once and serve every chunk
+        with reuse_pool():
+            for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize, **read_kwargs):
+                texts = chunk[text_col].astype(str).tolist()
+                embedding.ensure_model_accuracy(texts)
+                if cache is not None:
+                    chunk_vectors = cached_encode(texts, embedding.encode_texts, cache)
+                else:
+                    chunk_vectors = embedding.encode_texts(texts)
+
+                start, end = rows_done, rows_done + len(chunk)
+                vectors[start:end] = chunk_vectors
+                vectors.flush()
+
+                chunk = chunk[usecols]
+                chunk.insert(0, "row_id", np.arange(start, end))
+                part = checkpoint["parts"]
+                chunk[["row_id"]].to_parquet(part_path("row_ids", part), index=False)
+                # A chunk's tokens are never reused, so they stay out of the token cache
+                stats = embedding.embedding_stats(chunk, text_col, chunk_vectors, cache_tokens=False)
+                arrow_safe(stats).to_parquet(part_path("metadata", part), index=False)
+
+                rows_done = end
+                checkpoint["rows_done"] = rows_done
+                checkpoint["parts"] = part + 1
+                save_checkpoint(checkpoint)
+                print(f"[+] Embedded {rows_done}/{checkpoint['total_rows']} rows")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if checkpoint["parts"]:
+        for table in ("row_ids", "metadata"):
+            combine_parts([part_path(table, i) for i in range(checkpoint["parts"])], table)
+    # Streaming needs float32 rows to write into; the compact store format is applied once at the end
+    del vectors
+    compact_store(EMBEDDING_PATH)
+    checkpoint["complete"] = True
+    save_checkpoint(checkpoint)
+    shutil.rmtree(PARTS_DIR, ignore_errors=True)
+
+    elapsed = time.time() - start_time
+    print(f"[+] Streaming embeddings completed in {elapsed:.2f} seconds")
+    return open_store(EMBEDDING_PATH), elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream embeddings for a CSV larger than memory.")
+    parser.add_argument("csv_path")
+    parser.add_argument("text_col")
+    parser.add_argument("--columns", nargs="*", default=[], help="Metadata columns to carry into the session metadata table")
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    stream_embeddings(args.csv_path, args.text_col, columns=args.columns, chunksize=args.chunksize,
+                      use_cache=not args.no_cache, encoding=args.encoding, delimiter=args.delimiter)
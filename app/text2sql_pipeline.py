@@ -1,19 +1,14 @@
-import os
-import httpx
 import pandas as pd
 import numpy as np
-import sqlite3
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-from nltk.corpus import stopwords
-from dotenv import load_dotenv
+from app.registry import get_model
+from app.vector_index import VectorSearch, DEFAULT_NPROBE
+from app.sql_store import get_store, FTS_TABLE
+from app.llm_client import SyncLLMClient
+from app.llm_cache import print_stats
+from app.semantic_cache import QuestionCache, cache_scope, QUESTION_CACHE_THRESHOLD
+from app.profiling import span
 import re
 
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL = SentenceTransformer("all-MiniLM-L6-v2")
-stop_words = set(stopwords.words("english"))
-
 def mask_pii(text):
     if pd.isnull(text): return ""
     text = str(text)
@@ -22,7 +17,8 @@ def mask_pii(text):
     text = re.sub(r"\b\d+\b", "[NUMBER]", text)
     return text
 
-def run_text2sql_pipeline(df, text_col, pii_mask=False):
+def run_text2sql_pipeline(df, text_col, pii_mask=False, nprobe=DEFAULT_NPROBE, exact=False,
+                          cache_threshold=QUESTION_CACHE_THRESHOLD):
     print("[*] Text2SQL Pipeline Started")
     print(f"[+] Main text column: {text_col}")
 
@@ -34,73 +30,85 @@ def run_text2sql_pipeline(df, text_col, pii_mask=False):
     raw = input("Enter comma-separated column names to include in context (or press Enter for none): ").strip()
     selected_cols = [text_col] + [c.strip() for c in raw.split(",") if c.strip() in meta_cols]
 
-    embed_matrix = np.load("data/initial_embeddings.npy")
-    print(f"[+] Loaded embeddings with shape: {embed_matrix.shape}")
-
-    while True:
-        user_question = input("\nAsk a question (or type 'exit' to stop): ").strip()
-        if user_question.lower() == "exit":
-            print("Exiting Text2SQL.")
-            break
-
-        query_embed = MODEL.encode([user_question])
-        similarities = cosine_similarity(query_embed, embed_matrix)[0]
-        top_idxs = np.argsort(similarities)[-5:][::-1]
-
-        context_rows = []
-        for i in top_idxs:
-            row_data = []
-            for col in selected_cols:
-                val = df.iloc[i][col]
-                if pii_mask:
-                    val = mask_pii(val)
-                row_data.append(f"{col}: {val}")
-            context_rows.append(f"[Row {i}] " + "; ".join(row_data))
-
-        context = "\n\n".join(context_rows)
-
-        system_prompt = (
-            "You are a SQL expert helping generate SQLite queries. "
-            f"Use ONLY the following columns: {', '.join(df.columns)}"
-        )
-        user_prompt = (
-            f"Context:\n{context}\n\n"
-            f"User question:\n{user_question}\n\n"
-            "Write a valid SQL query to answer the question using the table 'df'."
-        )
-
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "llama3-70b-8192",
-            "messages": [
+    retriever = VectorSearch("data/initial_embeddings.npy", exact=exact, nprobe=nprobe)
+    print(f"[+] Loaded embeddings with shape: {retriever.shape}")
+    store = get_store(df, text_col)
+    model = get_model()
+    questions = QuestionCache(store.fingerprint, cache_scope(store.fingerprint, model.trex_cache_name, selected_cols, pii_mask),
+                              threshold=cache_threshold)
+
+    # One client for the whole session, so connections and the rate limit carry across questions
+    with SyncLLMClient() as llm:
+        while True:
+            user_question = input("\nAsk a question (or type 'exit' to stop): ").strip()
+            if user_question.lower() == "exit":
+                print_stats()
+                print(f"[+] Question cache: {questions.hits} hits, {questions.misses} misses")
+                questions.close()
+                print("Exiting Text2SQL.")
+                break
+
+            query_embed = model.encode([user_question])
+
+            # A near-identical question answered on this data skips retrieval and the LLM call
+            cached = questions.lookup(query_embed[0])
+            if cached is not None:
+                print(f"\n[+] Answered before (similarity {cached['similarity']:.2f}): {cached['question']}")
+                print("Cached SQL Query:\n", cached['sql'])
+                if cached['result'] is not None:
+                    print("\n[+] Query result:")
+                    print(cached['result'].head())
+                if input("Press Enter to keep this answer, or type 'new' to generate a fresh query: ").strip().lower() != "new":
+                    continue
+
+            with span("vector_search", nprobe=nprobe, exact=exact):
+                top_idxs, _ = retriever.search(query_embed, k=5)
+
+            context_rows = []
+            for i in top_idxs:
+                row_data = []
+                for col in selected_cols:
+                    val = df.iloc[i][col]
+                    if pii_mask:
+                        val = mask_pii(val)
+                    row_data.append(f"{col}: {val}")
+                context_rows.append(f"[Row {i}] " + "; ".join(row_data))
+
+            context = "\n\n".join(context_rows)
+
+            system_prompt = (
+                "You are a SQL expert helping generate SQLite queries. "
+                f"Use ONLY the following columns: {', '.join(df.columns)}"
+            )
+            if store.has_fts:
+                system_prompt += (
+                    f". For keyword search over {text_col}, join FTS5 table '{FTS_TABLE}' "
+                    f"on {FTS_TABLE}.rowid = df.rowid and filter with {FTS_TABLE} MATCH 'terms'"
+                )
+            user_prompt = (
+                f"Context:\n{context}\n\n"
+                f"User question:\n{user_question}\n\n"
+                "Write a valid SQL query to answer the question using the table 'df'."
+            )
+
+            messages = [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 200
-        }
-
-        try:
-            response = httpx.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload)
-            if response.status_code == 200:
-                reply = response.json()["choices"][0]["message"]["content"].strip()
-                print("\nGenerated SQL Query:\n", reply)
-                user_query = input("Press Enter to run this, or paste your own SQL query: ").strip() or reply
-
-                conn = sqlite3.connect(":memory:")
-                df.to_sql("df", conn, index=False)
-                try:
-                    result = pd.read_sql_query(user_query, conn)
-                    print("\n[+] Query result:")
-                    print(result.head())
-                except Exception as e:
-                    print("[!] Query execution failed:", e)
-                finally:
-                    conn.close()
-            else:
-                print(f"[!] LLM Error: {response.status_code} - {response.text}")
-        except Exception as e:
-            print("[!] HTTP error:", e)
+            ]
+
+            try:
+                reply = llm.chat(messages, temperature=0.3, max_tokens=200).strip()
+            except Exception as e:
+                print(f"[!] LLM Error: {e}")
+                continue
+
+            print("\nGenerated SQL Query:\n", reply)
+            user_query = input("Press Enter to run this, or paste your own SQL query: ").strip() or reply
+
+            try:
+                result = store.query(user_query)
+                print("\n[+] Query result:")
+                print(result.head())
+                questions.add(user_question, query_embed[0], user_query, result)
+            except Exception as e:
+                print("[!] Query execution failed:", e)
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+from nltk.tokenize import word_tokenize
+from app.profiling import span
+
+CACHE_DIR = "data/token_cache"
+TOKENIZER = "nltk.word_tokenize"
+CHUNK_ROWS = 20_000
+PARALLEL_MIN_ROWS = 50_000
+# Tokenized datasets kept on disk; the least recently used ones are removed beyond this
+MAX_CACHED_DATASETS = 8
+
+# Only the most recent dataset stays in memory: (fingerprint, TokenCache)
+_last = None
+
+
+def texts_fingerprint(texts):
+    h = hashlib.blake2b(TOKENIZER.encode("utf-8"), digest_size=16)
+    h.update(pd.util.hash_pandas_object(pd.Series(texts, dtype=object), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def tokenize_chunk(texts):
+    """Tokenize a chunk into a local vocabulary, flat token ids and per-text lengths."""
+    vocab = {}
+    ids = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        tokens = word_tokenize(text)
+        lengths[i] = len(tokens)
+        ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+    return list(vocab), np.asarray(ids, dtype=np.int32), lengths
+
+
+class TokenCache:
+    """Tokenized corpus in columnar form: tokens of text i are vocab[ids[offsets[i]:offsets[i + 1]]].
+
+    Raw tokens are stored once per dataset; stopword handling is a mask over the
+    vocabulary, so every stopword configuration reuses the same tokenization.
+    """
+
+    def __init__(self, offsets, ids, vocab):
+        self.offsets = offsets
+        self.ids = ids
+        self.vocab = vocab
+        self._lower = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(cls, texts, workers=None):
+        chunks = [texts[i:i + CHUNK_ROWS] for i in range(0, len(texts), CHUNK_ROWS)]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(texts) < PARALLEL_MIN_ROWS:
+            parts = [tokenize_chunk(chunk) for chunk in chunks]
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(min(workers, len(chunks))) as pool:
+                parts = pool.map(tokenize_chunk, chunks)
+
+        # Merge chunk vocabularies by remapping each chunk's local ids to global ones
+        vocab = {}
+        ids, lengths = [], []
+        for local_vocab, local_ids, local_lengths in parts:
+            remap = np.array([vocab.setdefault(t, len(vocab)) for t in local_vocab], dtype=np.int32)
+            ids.append(remap[local_ids] if len(local_ids) else local_ids)
+            lengths.append(local_lengths)
+        lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int32)
+        return cls(offsets, ids, list(vocab))
+
+    def save(self, path):
+        # Vocabulary first and arrays last, each via a temporary file, since the .npz marks a complete entry
+        with open(path + ".vocab.txt.tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.vocab))
+        os.replace(path + ".vocab.txt.tmp", path + ".vocab.txt")
+        with open(path + ".npz.tmp", "wb") as f:
+            np.savez(f, offsets=self.offsets, ids=self.ids)
+        os.replace(path + ".npz.tmp", path + ".npz")
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path + ".npz")
+        with open(path + ".vocab.txt", encoding="utf-8") as f:
+            content = f.read()
+        vocab = content.split("\n") if content else []
+        return cls(data["offsets"], data["ids"], vocab)
+
+    def token_counts(self):
+        return np.diff(self.offsets)
+
+    def doc_index(self):
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.token_counts())
+
+    def lower_ids(self):
+        """Map every token id to the id of its lowercased form, plus the lowercased vocabulary."""
+        if self._lower is None:
+            lower_vocab, codes = np.unique(np.array([t.lower() for t in self.vocab], dtype=object), return_inverse=True)
+            self._lower = (codes.astype(np.int32)[self.ids], list(lower_vocab))
+        return self._lower
+
+    def stopword_mask(self, stopword_set):
+        return np.array([t.lower() in stopword_set for t in self.vocab], dtype=bool)
+
+    def stopword_counts(self, stopword_set):
+        is_stop = self.stopword_mask(stopword_set)[self.ids]
+        return np.bincount(self.doc_index()[is_stop], minlength=len(self))
+
+    def filtered_texts(self, stopword_set):
+        """Texts re-joined from their tokens with stopwords dropped."""
+        keep = ~self.stopword_mask(stopword_set)
+        vocab = np.array(self.vocab, dtype=object)
+        tokens = vocab[self.ids]
+        kept = keep[self.ids]
+        return [" ".join(tokens[s:e][kept[s:e]]) for s, e in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+def evict(cache_dir=CACHE_DIR, max_datasets=MAX_CACHED_DATASETS):
+    """Remove the least recently used tokenized datasets beyond max_datasets."""
+    entries = [f[:-len(".npz")] for f in os.listdir(cache_dir) if f.endswith(".npz")]
+    entries.sort(key=lambda e: os.path.getmtime(os.path.join(cache_dir, e + ".npz")), reverse=True)
+    for entry in entries[max_datasets:]:
+        for suffix in (".npz", ".vocab.txt"):
+            path = os.path.join(cache_dir, entry + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def get_token_cache(texts, cache_dir=CACHE_DIR, persist=True):
+    """Tokenize texts once per dataset: memory first, then disk, building only on a miss.
+
+    persist=False skips the disk cache, for one-off slices such as streamed chunks.
+    """
+    global _last
+    texts = [str(t) for t in texts]
+    fingerprint = texts_fingerprint(texts)
+    if _last is not None and _last[0] == fingerprint:
+        return _last[1]
+
+    path = os.path.join(cache_dir, fingerprint)
+    if persist and os.path.exists(path + ".npz"):
+        cache = TokenCache.load(path)
+        os.utime(path + ".npz")
+    else:
+        print(f"[+] Tokenizing {len(texts)} texts...")
+        with span("tokenize", rows=len(texts)):
+            cache = TokenCache.build(texts)
+        if persist:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache.save(path)
+            evict(cache_dir)
+    _last = (fingerprint, cache)
+    return cache
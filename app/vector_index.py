@@ -0,0 +1,157 @@
+import os
+import time
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from app.embedding_store import open_store, RESCORE_FACTOR
+
+INDEX_SUFFIX = ".ivf.npz"
+MIN_INDEX_ROWS = 20_000
+TRAIN_SIZE = 100_000
+DEFAULT_NPROBE = 8
+BLOCK_ROWS = 65_536
+# Memory for one block of rows and its row-to-centroid scores while assigning rows to lists
+ASSIGN_BUDGET_BYTES = 256 * 2 ** 20
+
+
+def normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    k = min(k, len(scores))
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def exact_search(embeddings, query, k=5):
+    """Brute-force inner-product top-k, scanning the memory-mapped store in blocks.
+
+    Lossy (int8) stores shortlist RESCORE_FACTOR * k rows and rescore them before taking the top k.
+    """
+    query = normalize(query)[0]
+    final_k, k = k, k * RESCORE_FACTOR if embeddings.lossy else k
+    best_ids = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float32)
+    for start in range(0, len(embeddings), BLOCK_ROWS):
+        scores = embeddings.scores(slice(start, start + BLOCK_ROWS), query)
+        local = top_k(scores, k)
+        best_ids = np.concatenate([best_ids, local + start])
+        best_scores = np.concatenate([best_scores, scores[local]])
+        keep = top_k(best_scores, k)
+        best_ids, best_scores = best_ids[keep], best_scores[keep]
+    if embeddings.lossy:
+        return embeddings.rerank(best_ids, query, final_k)
+    return best_ids, best_scores
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed by nearest centroid and only the nprobe closest buckets are scanned."""
+
+    def __init__(self, centroids, offsets, ids, source):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.source = source
+        self.embeddings = None
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, seed=42):
+        n = len(embeddings)
+        n_lists = n_lists or max(1, min(n, int(4 * np.sqrt(n))))
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(n, max(TRAIN_SIZE, n_lists * 40)), replace=False))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=1, random_state=seed)
+        kmeans.fit(np.asarray(embeddings[sample]))
+        centroids = normalize(kmeans.cluster_centers_)
+
+        # The score block grows with n_lists (4 * sqrt(n)), so its height shrinks to stay within budget
+        block_rows = max(1024, ASSIGN_BUDGET_BYTES // (4 * (n_lists + centroids.shape[1])))
+        assignments = np.empty(n, dtype=np.int32)
+        for start in range(0, n, block_rows):
+            block = np.asarray(embeddings[start:start + block_rows])
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+        return cls(centroids, offsets, ids, None)
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, ids=self.ids,
+                 source=np.array(self.source, dtype=np.float64))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["centroids"], data["offsets"], data["ids"], tuple(data["source"].tolist()))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def search(self, query, k=5, nprobe=DEFAULT_NPROBE):
+        """Approximate top-k by inner product; higher nprobe trades latency for recall."""
+        query = normalize(query)[0]
+        nprobe = min(nprobe, self.n_lists)
+        lists = top_k(self.centroids @ query, nprobe)
+        candidates = np.concatenate([self.ids[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        if len(candidates) < k:
+            return exact_search(self.embeddings, query, k)
+
+        candidates.sort()
+        scores = self.embeddings.scores(candidates, query)
+        if self.embeddings.lossy:
+            return self.embeddings.rerank(candidates[top_k(scores, k * RESCORE_FACTOR)], query, k)
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+
+def source_stat(embedding_path):
+    stat = os.stat(embedding_path)
+    return (float(stat.st_size), float(stat.st_mtime))
+
+
+def load_or_build_index(embedding_path="data/initial_embeddings.npy", n_lists=None):
+    """Open the index saved next to the embeddings, rebuilding it if the embeddings changed."""
+    embeddings = open_store(embedding_path)
+    index_path = embedding_path[:-len(".npy")] + INDEX_SUFFIX
+    stat = source_stat(embedding_path)
+
+    index = None
+    if os.path.exists(index_path):
+        index = IVFIndex.load(index_path)
+        if index.source != stat:
+            index = None
+
+    if index is None:
+        start = time.time()
+        index = IVFIndex.build(embeddings, n_lists)
+        index.source = stat
+        index.save(index_path)
+        print(f"[+] Built IVF index with {index.n_lists} lists in {time.time() - start:.2f} seconds")
+
+    index.embeddings = embeddings
+    return index
+
+
+class VectorSearch:
+    """Top-k retrieval over the session embeddings: IVF for large matrices, exact scan otherwise."""
+
+    def __init__(self, embedding_path="data/initial_embeddings.npy", exact=False, nprobe=DEFAULT_NPROBE):
+        self.embeddings = open_store(embedding_path)
+        self.nprobe = nprobe
+        self.index = None
+        if not exact and len(self.embeddings) >= MIN_INDEX_ROWS:
+            self.index = load_or_build_index(embedding_path)
+
+    @property
+    def shape(self):
+        return self.embeddings.shape
+
+    def search(self, query, k=5):
+        if self.index is None:
+            return exact_search(self.embeddings, query, k)
+        return self.index.search(query, k, self.nprobe)
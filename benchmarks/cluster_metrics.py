@@ -0,0 +1,61 @@
+"""Scaling of cluster-quality metrics with n: sklearn silhouette vs. blocked, sampled and linear-time metrics.
+
+Run from the repo root:  python benchmarks/cluster_metrics.py [max_rows]
+sklearn's full silhouette is skipped above SKLEARN_MAX_ROWS, where it becomes impractical.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.metrics import silhouette_score
+from app.cluster_metrics import (blocked_silhouette, sampled_silhouette, centroid_stats,
+                                 davies_bouldin, calinski_harabasz)
+
+DIM = 384
+K = 10
+SKLEARN_MAX_ROWS = 20_000
+BLOCKED_MAX_ROWS = 100_000
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(K, DIM)).astype(np.float32)
+    labels = rng.integers(0, K, n)
+    X = centers[labels] + rng.normal(scale=2.0, size=(n, DIM)).astype(np.float32)
+    return X, labels
+
+
+def timed(fn):
+    t = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - t
+
+
+if __name__ == "__main__":
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    sizes = [n for n in (5_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000) if n <= max_rows]
+
+    print(f"{'n':>9} | {'sklearn':>14} | {'blocked':>14} | {'sampled (95% CI)':>30} | {'DB+CH':>8}")
+    for n in sizes:
+        X, labels = synthetic(n)
+        row = [f"{n:>9}"]
+        if n <= SKLEARN_MAX_ROWS:
+            score, t = timed(lambda: silhouette_score(X, labels))
+            row.append(f"{score:.4f} {t:6.2f}s")
+        else:
+            row.append(f"{'-':>14}")
+        if n <= BLOCKED_MAX_ROWS:
+            score, t = timed(lambda: blocked_silhouette(X, labels))
+            row.append(f"{score:.4f} {t:6.2f}s")
+        else:
+            row.append(f"{'-':>14}")
+        (score, low, high), t = timed(lambda: sampled_silhouette(X, labels))
+        row.append(f"{score:.4f} [{low:.4f}, {high:.4f}] {t:5.2f}s")
+        stats, t_stats = timed(lambda: centroid_stats(X, labels))
+        _, t = timed(lambda: (davies_bouldin(*stats), calinski_harabasz(*stats)))
+        t += t_stats
+        row.append(f"{t:7.2f}s")
+        print(" | ".join(row))
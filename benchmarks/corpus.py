@@ -0,0 +1,128 @@
+"""Synthetic text + metadata corpus with a known number of exact and near duplicates.
+
+Run from the repo root:  python benchmarks/corpus.py out.csv 1000000 [--exact 0.05] [--near 0.05]
+
+Texts are drawn from TOPICS separate Zipf vocabularies, so they form clusters. Duplicates copy an
+original: exact ones verbatim, near ones with a word or two swapped, which keeps their word
+Jaccard above the MinHash threshold. Ground truth is kept in source_id (the row copied, or the row's
+own id) and dup_kind (original / exact / near). Rows are produced in chunks, so 10M rows need no
+more memory than one chunk.
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+TOPICS = 8
+VOCAB_PER_TOPIC = 1_500
+SHARED_VOCAB = 300
+MIN_WORDS, MAX_WORDS = 12, 60
+CHUNK_ROWS = 100_000
+# Recent originals that later duplicates may copy; bounds memory while still spanning chunk boundaries
+POOL_SIZE = 50_000
+REGIONS = ["north", "south", "east", "west", "central", "coastal", "mountain", "island"]
+CHANNELS = ["web", "email", "phone", "chat", "store"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "en", "da", "po", "li", "zu", "ber", "gan", "tor"]
+
+
+def make_words(count, rng):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return np.array(sorted(words), dtype=object)
+
+
+class Corpus:
+    def __init__(self, exact_rate=0.05, near_rate=0.05, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.exact_rate = exact_rate
+        self.near_rate = near_rate
+        words = make_words(TOPICS * VOCAB_PER_TOPIC + SHARED_VOCAB, self.rng)
+        self.shared = words[:SHARED_VOCAB]
+        self.topics = words[SHARED_VOCAB:].reshape(TOPICS, VOCAB_PER_TOPIC)
+        zipf = 1.0 / np.arange(1, VOCAB_PER_TOPIC + 1)
+        self.zipf = zipf / zipf.sum()
+        self.pool_texts = np.empty(0, dtype=object)
+        self.pool_ids = np.empty(0, dtype=np.int64)
+        self.next_id = 0
+
+    def original_texts(self, topics):
+        lengths = self.rng.integers(MIN_WORDS, MAX_WORDS + 1, size=len(topics))
+        picks = self.rng.choice(VOCAB_PER_TOPIC, size=(len(topics), MAX_WORDS), p=self.zipf)
+        shared = self.rng.random((len(topics), MAX_WORDS)) < 0.15
+        filler = self.shared[self.rng.integers(0, SHARED_VOCAB, size=(len(topics), MAX_WORDS))]
+        words = np.where(shared, filler, self.topics[topics[:, None], picks])
+        return np.array([" ".join(row[:n]) for row, n in zip(words, lengths)], dtype=object)
+
+    def perturb(self, text):
+        words = text.split()
+        for _ in range(max(1, len(words) // 25)):
+            words[self.rng.integers(len(words))] = self.shared[self.rng.integers(SHARED_VOCAB)]
+        return " ".join(words)
+
+    def chunk(self, n):
+        ids = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        roll = self.rng.random(n)
+        kind = np.where(roll >= self.exact_rate + self.near_rate, "original",
+                        np.where(roll < self.exact_rate, "exact", "near"))
+        if not len(self.pool_ids):
+            kind[0] = "original"  # the very first row has nothing to copy
+
+        topics = self.rng.integers(0, TOPICS, size=n)
+        texts = np.empty(n, dtype=object)
+        source = ids.copy()
+        is_original = kind == "original"
+        texts[is_original] = self.original_texts(topics[is_original])
+        # Copies may come from this chunk's originals too, so small corpora still get duplicates
+        self.pool_texts = np.concatenate([self.pool_texts, texts[is_original]])[-POOL_SIZE:]
+        self.pool_ids = np.concatenate([self.pool_ids, ids[is_original]])[-POOL_SIZE:]
+
+        copies = np.flatnonzero(~is_original)
+        if len(copies):
+            picked = self.rng.integers(0, len(self.pool_ids), size=len(copies))
+            source[copies] = self.pool_ids[picked]
+            texts[copies] = self.pool_texts[picked]
+            for i in copies[kind[copies] == "near"]:
+                texts[i] = self.perturb(texts[i])
+
+        return pd.DataFrame({
+            "text": texts,
+            "region": np.array(REGIONS)[(topics + self.rng.integers(0, 2, size=n)) % len(REGIONS)],
+            "channel": np.array(CHANNELS)[self.rng.integers(0, len(CHANNELS), size=n)],
+            "rating": self.rng.integers(1, 6, size=n),
+            "created": (np.datetime64("2024-01-01") + self.rng.integers(0, 365, size=n)).astype(str),
+            "source_id": source,
+            "dup_kind": kind,
+        })
+
+
+def generate(rows, exact_rate=0.05, near_rate=0.05, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield the corpus as DataFrame chunks of at most chunk_rows."""
+    corpus = Corpus(exact_rate, near_rate, seed)
+    for start in range(0, rows, chunk_rows):
+        yield corpus.chunk(min(chunk_rows, rows - start))
+
+
+def write_csv(path, rows, exact_rate=0.05, near_rate=0.05, seed=0, chunk_rows=CHUNK_ROWS):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    for i, chunk in enumerate(generate(rows, exact_rate, near_rate, seed, chunk_rows)):
+        chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus with injected duplicates")
+    parser.add_argument("path")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--exact", type=float, default=0.05, help="Share of rows that are exact copies")
+    parser.add_argument("--near", type=float, default=0.05, help="Share of rows that are near copies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_csv(args.path, args.rows, args.exact, args.near, args.seed)
+    print(f"Wrote {args.rows} rows to {args.path} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,238 @@
+"""End-to-end pipeline benchmark on a synthetic corpus, checked against a stored baseline.
+
+Run from the repo root:
+    python benchmarks/pipeline.py --rows 10000 100000            # compare with benchmarks/baseline.json
+    python benchmarks/pipeline.py --rows 10000 --update-baseline  # record this machine's numbers
+
+Every size gets its own scratch directory holding a generated corpus (benchmarks/corpus.py) and the
+batch session it produces. Each stage (load, embed, dedup, cluster, text2sql) runs in a fresh process,
+so its peak RSS is its own. The embedding model and the LLM endpoint are the offline stand-ins from
+benchmarks/stubs.py; NLTK's punkt and stopwords data must be installed, as for the app itself.
+
+A stage regresses when its rows/sec drops more than --tolerance below the baseline, its peak RSS
+grows more than --memory-tolerance above it, or dedup recall of the injected duplicates falls by more
+than RECALL_TOLERANCE. The exit status is 1 if anything regressed.
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import write_csv
+
+STAGES = ["load", "embed", "dedup", "cluster", "text2sql"]
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+CORPUS_NAME = "corpus.csv"
+CONFIG_NAME = "bench.json"
+QUESTIONS = 20
+RECALL_TOLERANCE = 0.02
+RESULT_PREFIX = "BENCH_RESULT "
+
+CONFIG = {
+    "input": {"path": CORPUS_NAME},
+    "text_col": "text",
+    "metadata": ["region", "channel", "rating", "created"],
+    "cast": {"region": "category", "channel": "category"},
+    # Encoding is what is being measured, so the embedding cache stays off
+    "embed": {"use_cache": False},
+    "dedup": {"stopwords": "default", "semantic": False},
+    "cluster": {"k": None, "save_wordclouds": False, "label_with_llm": True},
+    "eda": {"enabled": False},
+}
+
+
+def machine():
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+
+def dedup_recall(groups_path, corpus_path):
+    """Share of injected exact / near copies that ended up in the same group as the row they copy."""
+    groups = pd.read_csv(groups_path, usecols=["row_id", "dup_group_id"]).set_index("row_id")["dup_group_id"]
+    truth = pd.read_csv(corpus_path, usecols=["source_id", "dup_kind"])
+    truth["row_id"] = truth.index
+    recall = {}
+    for kind in ("exact", "near"):
+        copies = truth[truth["dup_kind"] == kind]
+        if len(copies):
+            same = groups.loc[copies["row_id"]].to_numpy() == groups.loc[copies["source_id"]].to_numpy()
+            recall[f"{kind}_recall"] = round(float(same.mean()), 4)
+    return recall
+
+
+def scripted_input(answers):
+    answers = iter(answers)
+    return lambda prompt="": next(answers)
+
+
+def run_text2sql(config, questions):
+    from app.session_store import load_table
+    from app.text2sql_pipeline import run_text2sql_pipeline
+
+    # Prompts in order: context columns, then per question the question and "run this SQL";
+    # a threshold above 1 keeps the question cache from answering, so every question does the full work
+    answers = [""]
+    for i in range(questions):
+        answers += [f"How many {config['metadata'][i % 2]} values appear in rows like number {i}?", ""]
+    answers.append("exit")
+    original_input = builtins.input
+    builtins.input = scripted_input(answers)
+    try:
+        run_text2sql_pipeline(load_table("metadata"), config["text_col"], cache_threshold=1.01)
+    finally:
+        builtins.input = original_input
+
+
+def run_child(stage, rows, questions):
+    """Run one stage in this (fresh) process on the session in the current directory and print its result."""
+    from app.batch import load_config, RUNNERS
+    from app.profiling import trace, span, peak_rss_mb
+    from stubs import install_stub_model
+
+    install_stub_model()
+    config = load_config(CONFIG_NAME)
+    with trace(f"bench-{stage}"):
+        with span(stage, rows=questions if stage == "text2sql" else rows) as record:
+            if stage == "text2sql":
+                run_text2sql(config, questions)
+            else:
+                RUNNERS[stage](config)
+
+    result = {"wall_s": record["wall_s"], "rows_per_sec": record["rows_per_sec"], "peak_rss_mb": round(peak_rss_mb(), 1)}
+    if stage == "dedup":
+        result.update(dedup_recall("results/dedup/dup_groups.csv", CORPUS_NAME))
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def run_stage(stage, rows, workdir, env, questions):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", stage, "--rows", str(rows), "--questions", str(questions)]
+    proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stdout[-2000:] + proc.stderr[-4000:])
+        raise SystemExit(f"[!] Stage {stage} failed at {rows} rows")
+    line = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)][-1]
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def bench_size(rows, workdir, stages, env, args):
+    os.makedirs(workdir, exist_ok=True)
+    corpus_path = os.path.join(workdir, CORPUS_NAME)
+    if not os.path.exists(corpus_path):
+        write_csv(corpus_path, rows, args.exact, args.near, args.seed)
+    with open(os.path.join(workdir, CONFIG_NAME), "w") as f:
+        json.dump({**CONFIG, "dedup": {**CONFIG["dedup"], "semantic": args.semantic}}, f, indent=2)
+
+    results = {}
+    # Later stages read what earlier ones left in the session, so they always run in order
+    for stage in STAGES[:max(STAGES.index(s) for s in stages) + 1]:
+        if stage not in stages:
+            run_stage(stage, rows, workdir, env, args.questions)
+            continue
+        # Best of several runs, since a single timing on a busy machine is noisy
+        runs = [run_stage(stage, rows, workdir, env, args.questions) for _ in range(args.repeat)]
+        result = min(runs, key=lambda r: r["wall_s"])
+        results[stage] = result
+        print(f"  {stage:<9} {result['wall_s']:8.2f}s {result['rows_per_sec'] or 0:12.1f} rows/s "
+              f"{result['peak_rss_mb']:8.1f} MB peak")
+    return results
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Rows of (size, stage, metric, value, baseline value, change, regressed)."""
+    rows = []
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            for metric, value in metrics.items():
+                ref = base.get(metric)
+                if ref is None or value is None or metric == "wall_s":
+                    continue
+                if metric == "rows_per_sec":
+                    regressed = value < ref * (1 - tolerance)
+                elif metric == "peak_rss_mb":
+                    regressed = value > ref * (1 + memory_tolerance)
+                else:
+                    regressed = value < ref - RECALL_TOLERANCE
+                change = (value - ref) / ref if ref else 0.0
+                rows.append((size, stage, metric, value, ref, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the T.REX pipeline on a synthetic corpus")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000], help="Corpus sizes, e.g. 10000 1000000")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--exact", type=float, default=0.05, help="Share of injected exact duplicates")
+    parser.add_argument("--near", type=float, default=0.05, help="Share of injected near duplicates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--semantic", action="store_true", help="Include semantic dedup in the dedup stage")
+    parser.add_argument("--questions", type=int, default=QUESTIONS, help="Text2SQL questions per run")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Seconds the stub LLM takes per reply")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed drop in rows/sec")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="Allowed growth in peak RSS")
+    parser.add_argument("--workdir", help="Keep corpora and sessions here instead of a temporary directory")
+    parser.add_argument("--child", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows[0], args.questions)
+        return 0
+
+    from stubs import StubLLMServer
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="trex-bench-")
+    results = {}
+    with StubLLMServer(delay=args.llm_delay) as llm:
+        env = dict(os.environ, GROQ_API_URL=llm.url, GROQ_API_KEY="stub", GROQ_REQUESTS_PER_MINUTE="60000",
+                   TREX_EMBED_WORKERS="1", MPLBACKEND="Agg",
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        try:
+            for rows in args.rows:
+                print(f"[*] {rows} rows")
+                results[str(rows)] = bench_size(rows, os.path.join(workdir, f"rows-{rows}"), args.stages, env, args)
+        finally:
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+
+    if args.update_baseline or not stored:
+        for size, stages in results.items():
+            stored.setdefault("sizes", {}).setdefault(size, {}).update(stages)
+        stored["machine"] = machine()
+        with open(args.baseline, "w") as f:
+            json.dump(stored, f, indent=2)
+        print(f"[+] Baseline written to {args.baseline}")
+        return 0
+
+    if stored.get("machine", {}).get("cpus") != os.cpu_count():
+        print(f"[!] Baseline was recorded on a different machine: {stored.get('machine')}")
+    rows = compare(results, stored.get("sizes", {}), args.tolerance, args.memory_tolerance)
+    print(f"\n{'rows':>9} {'stage':<9} {'metric':<13} {'value':>12} {'baseline':>12} {'change':>8}")
+    for size, stage, metric, value, ref, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:>9} {stage:<9} {metric:<13} {value:>12.4g} {ref:>12.4g} {change:>+8.1%}{flag}")
+    regressions = sum(r[-1] for r in rows)
+    print(f"[{'!' if regressions else '✓'}] {regressions} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
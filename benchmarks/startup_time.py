@@ -0,0 +1,44 @@
+"""Cold-start comparison: importing T.REX with lazy resources vs. loading them eagerly at import.
+
+Run from the repo root:  python benchmarks/startup_time.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = """
+import time
+t = time.perf_counter()
+import main
+print(time.perf_counter() - t)
+"""
+
+# What every launch paid before resources were loaded on first use
+EAGER = """
+import time
+t = time.perf_counter()
+import main
+from app.registry import get_model, get_stopwords
+get_model()
+get_stopwords()
+print(time.perf_counter() - t)
+"""
+
+
+def measure(code, runs):
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    lazy = measure(LAZY, runs)
+    eager = measure(EAGER, runs)
+    print(f"Eager import + model/corpus load: {eager:.2f}s")
+    print(f"Lazy import (time to file dialog): {lazy:.2f}s")
+    print(f"Cold start speedup: {eager / lazy:.1f}x ({eager - lazy:.2f}s saved)")
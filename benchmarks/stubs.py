@@ -0,0 +1,80 @@
+"""Offline stand-ins for the embedding model and the Groq endpoint, so benchmarks need no GPU, downloads or API key.
+
+StubModel hashes words into a sparse vector and projects it to DIM dimensions: deterministic, fast,
+and texts sharing most words still land close together, which is all dedup, clustering and retrieval
+need. StubLLMServer answers the chat completions API on localhost with a fixed delay.
+"""
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+DIM = 384
+HASH_FEATURES = 2 ** 14
+STUB_SQL = "SELECT region, COUNT(*) AS n FROM df GROUP BY region ORDER BY n DESC"
+
+
+class StubModel:
+    trex_device = "cpu"
+    trex_backend = "stub"
+    trex_cache_name = f"stub-hashing-{DIM}"
+    max_seq_length = 256
+    tokenizer = None
+
+    def __init__(self, seed=0):
+        self.vectorizer = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False, norm=None)
+        rng = np.random.default_rng(seed)
+        self.projection = rng.standard_normal((HASH_FEATURES, DIM)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        counts = self.vectorizer.transform(list(texts)).astype(np.float32)
+        embeddings = np.asarray(counts @ self.projection, dtype=np.float32)
+        return normalize(embeddings) if normalize_embeddings else embeddings
+
+
+def install_stub_model():
+    from app.registry import replace
+    replace("model", StubModel())
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        prompt = " ".join(m["content"] for m in body["messages"])
+        time.sleep(self.delay)
+        content = STUB_SQL if "SQL" in prompt else json.dumps({"label": "Stub Label", "description": "Stub description."})
+        out = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+class StubLLMServer:
+    """Local chat completions endpoint; point GROQ_API_URL at .url."""
+
+    def __init__(self, delay=0.05, port=0):
+        handler = type("Handler", (StubLLMHandler,), {"delay": delay})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/chat/completions"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
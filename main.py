@@ -1,24 +1,46 @@
+import time
+STARTUP_BEGIN = time.perf_counter()
+
 from app.file_loader import popup_csv_loader, trex_start
-from app.embedding import generate_embeddings
-import pandas as pd
+from app.embedding import generate_embeddings, STATS_COLUMNS, EMBED_STATS_COLUMNS
+from app.session_store import load_table, table_columns, table_exists
 from app.pipeline import metadata_viz
 from app.dedup import trex_dedup
 from app.clustering import run_clustering_pipeline
 from app.text2sql_pipeline import run_text2sql_pipeline
+from app.registry import warmup
+from app.batch import run_batch, STAGES
+from app.vector_index import DEFAULT_NPROBE
+from app.semantic_dedup import SEMANTIC_THRESHOLD
+from app.semantic_cache import QUESTION_CACHE_THRESHOLD
+from app.profiling import trace
 import os
 
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="T.REX: Text Refinement and EXploration")
+    parser.add_argument("--batch", metavar="CONFIG", help="Run the pipeline headlessly from a JSON config")
+    parser.add_argument("--force", nargs="*", default=[], choices=STAGES, help="Stages to rerun even if up to date (batch mode)")
+    cli_args = parser.parse_args()
+    if cli_args.batch:
+        run_batch(cli_args.batch, force=cli_args.force)
+        raise SystemExit(0)
+
+    # Model and corpora load in the background while the user picks a file
+    warmup()
+    print(f"[+] T.REX started in {time.perf_counter() - STARTUP_BEGIN:.2f} seconds")
     print("Launching T.REX file loader...")
-    df = popup_csv_loader()
-    if df is not None:
+    source = popup_csv_loader()
+    if source is not None:
         print("[+] File Loaded.")
-        print(f"[+] Sample rows:\n{df.head(10)}")
-        loaded_df, text_col = trex_start(df)
+        print(f"[+] Sample rows:\n{source.sample.head(10)}")
+        loaded_df, text_col = trex_start(source)
         if loaded_df is not None:
             print(f"[+] Metadata and text columns detected...\n{loaded_df.head(10)}")
 
-            _, elapsed = generate_embeddings(loaded_df, text_col)
+            with trace("embed"):
+                _, elapsed = generate_embeddings(loaded_df, text_col)
             print("[*] TREX Ready for Refinement and EXploration.")
             print("[*] Type a command (e.g., trex_taskName(param=['param1', 'param2']))")
 
@@ -37,8 +59,10 @@ if __name__ == '__main__':
                             print("⚠️  Please pass metadata column names. Example: trex_eda(metadata=['col1', 'col2'])")
                             continue
 
-                        eda_df = cached_df if cached_df is not None else pd.read_csv("data/embedding_metadata.csv")
-                        metadata_viz(eda_df, text_col, metadata_cols)
+                        eda_cols = ['row_id', text_col] + metadata_cols + STATS_COLUMNS
+                        eda_df = cached_df if cached_df is not None else load_table("metadata", columns=eda_cols)
+                        with trace("trex_eda"):
+                            metadata_viz(eda_df, text_col, metadata_cols)
                         print("[*] EDA completed. Ready for next command.")
 
                     except Exception as e:
@@ -46,7 +70,7 @@ if __name__ == '__main__':
 
                 elif cmd == "trex_restart()":
                     try:
-                        cached_df = pd.read_csv("data/embedding_metadata.csv")
+                        cached_df = load_table("metadata")
                         print("[+] Cached file reloaded into memory. You may rerun commands now.")
                     except Exception as e:
                         print(f"[ERROR] Failed to load cached file: {e}")
@@ -55,7 +79,8 @@ if __name__ == '__main__':
                     try:
                         exec_env = {}
                         exec(f"args_dict = dict{cmd[len('trex_dedup'):].strip()}", {}, exec_env)
-                        stop_flag = exec_env.get("args_dict", {}).get("stopwords", False)
+                        args = exec_env.get("args_dict", {})
+                        stop_flag = args.get("stopwords", False)
 
                         if stop_flag:
                             use_default = input("Use default stopwords list? (y/n): ").strip().lower()
@@ -67,8 +92,13 @@ if __name__ == '__main__':
                         else:
                             stopwords_list = []
 
-                        dedup_df = cached_df if cached_df is not None else pd.read_csv("data/embedding_metadata.csv")
-                        trex_dedup(dedup_df, text_col, stopwords_list)
+                        # Embedding summary stats are not used by dedup, so they are not loaded
+                        dedup_cols = [c for c in table_columns("metadata") if c not in EMBED_STATS_COLUMNS]
+                        dedup_df = cached_df if cached_df is not None else load_table("metadata", columns=dedup_cols)
+                        with trace("trex_dedup"):
+                            trex_dedup(dedup_df, text_col, stopwords_list, semantic=args.get("semantic", False),
+                                       semantic_threshold=args.get("threshold", SEMANTIC_THRESHOLD),
+                                       incremental=args.get("incremental", False))
                         print("[*] Duplicate anlaysis complete. Ready for next command.")
                     
                     except Exception as e:
@@ -77,14 +107,14 @@ if __name__ == '__main__':
                 elif cmd == "trex_cluster()":
                     try:
                         embedding_path = "data/initial_embeddings.npy"
-                        metadata_path = "data/embedding_metadata.csv"
 
-                        if not os.path.exists(embedding_path) or not os.path.exists(metadata_path):
+                        if not os.path.exists(embedding_path) or not table_exists("metadata"):
                             print("[!] Missing embedding or metadata file. Relaunch and load the file from start.")
                             continue
 
                         print("[*] Running clustering pipeline...")
-                        run_clustering_pipeline(embedding_path, metadata_path)
+                        with trace("trex_cluster"):
+                            run_clustering_pipeline(embedding_path, "metadata", text_col=text_col)
                         print("[*] Clustering complete. Ready for next command.")
 
                     except Exception as e:
@@ -94,9 +124,13 @@ if __name__ == '__main__':
                     try:
                         exec_env = {}
                         exec(f"args_dict = dict{cmd[len('trex_text2sql'):].strip()}", {}, exec_env)
-                        pii_masking = exec_env.get("args_dict", {}).get("pii_mask", False)
-                        text2sql_df = cached_df if cached_df is not None else pd.read_csv("data/embedding_metadata.csv")
-                        run_text2sql_pipeline(text2sql_df, text_col, pii_mask=pii_masking)
+                        args = exec_env.get("args_dict", {})
+                        pii_masking = args.get("pii_mask", False)
+                        text2sql_df = cached_df if cached_df is not None else load_table("metadata")
+                        with trace("trex_text2sql"):
+                            run_text2sql_pipeline(text2sql_df, text_col, pii_mask=pii_masking,
+                                                  nprobe=args.get("nprobe", DEFAULT_NPROBE), exact=args.get("exact", False),
+                                                  cache_threshold=args.get("cache_threshold", QUESTION_CACHE_THRESHOLD))
                     except Exception as e:
                         print(f"[ERROR] Failed to run Text2SQL pipeline: {e}")
 
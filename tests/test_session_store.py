@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from app.session_store import save_table, load_table, combine_parts
+
+
+def test_save_table_mixed_type_column(tmp_path):
+    # ids that read_csv leaves as object: ints in some rows, strings in others
+    df = pd.DataFrame({"row_id": np.arange(4), "code": [1, "X12", 3, None], "region": pd.Categorical(list("abab"))})
+    save_table(df, "start", session_dir=tmp_path)
+
+    loaded = load_table("start", session_dir=tmp_path)
+    assert loaded["code"].iloc[:3].tolist() == ["1", "X12", "3"]
+    assert pd.isna(loaded["code"].iloc[3])
+    assert isinstance(loaded["region"].dtype, pd.CategoricalDtype)
+    assert df["code"].tolist()[:3] == [1, "X12", 3]  # the caller's frame is left alone
+
+
+def test_combine_parts_incompatible_types(tmp_path):
+    parts = []
+    for i, codes in enumerate([[1, 2], ["X1", "X2"]]):
+        path = str(tmp_path / f"part-{i}.parquet")
+        pd.DataFrame({"row_id": [2 * i, 2 * i + 1], "code": codes}).to_parquet(path, index=False)
+        parts.append(path)
+    combine_parts(parts, "metadata", session_dir=tmp_path)
+
+    loaded = load_table("metadata", session_dir=tmp_path)
+    assert loaded["row_id"].tolist() == [0, 1, 2, 3]
+    assert loaded["code"].tolist() == ["1", "2", "X1", "X2"]
+    assert pq.read_schema(tmp_path / "metadata.parquet").field("row_id").type == "int64"